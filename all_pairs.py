@@ -0,0 +1,117 @@
+import heapq
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# graph of the roadmap being solved, set once per worker process
+_graph = None
+
+
+def _init_worker(indptr, indices, weights):
+    global _graph
+    indptr = indptr.tolist()
+    indices, weights = indices.tolist(), weights.tolist()
+    _graph = [
+        list(
+            zip(indices[indptr[i] : indptr[i + 1]], weights[indptr[i] : indptr[i + 1]])
+        )
+        for i in range(len(indptr) - 1)
+    ]
+
+
+def _solve_sources(sources):
+    """
+    Dijkstra from each source. Returns the next-hop and distance rows: the
+    first node after the source on the shortest path to every node.
+    """
+    graph = _graph
+    num_nodes = len(graph)
+    next_rows = np.full((len(sources), num_nodes), -1, dtype=np.int32)
+    dist_rows = np.full((len(sources), num_nodes), np.inf, dtype=np.float32)
+    for row, source in enumerate(sources):
+        dist = [math.inf] * num_nodes
+        first = [-1] * num_nodes
+        dist[source] = 0.0
+        first[source] = source
+        heap = [(0.0, source)]
+        while heap:
+            d, current = heapq.heappop(heap)
+            if d > dist[current]:
+                continue
+            hop = first[current]
+            for next_idx, weight in graph[current]:
+                new_dist = d + weight
+                if new_dist < dist[next_idx]:
+                    dist[next_idx] = new_dist
+                    first[next_idx] = next_idx if current == source else hop
+                    heapq.heappush(heap, (new_dist, next_idx))
+        next_rows[row] = first
+        dist_rows[row] = dist
+    return sources, next_rows, dist_rows
+
+
+class AllPairsTable:
+    """
+    Shortest paths between every pair of roadmap nodes, precomputed with one
+    Dijkstra per node. next_hop[i, j] is the node after i on the way to j
+    (-1 if j is unreachable) and distance[i, j] the path length, so a path
+    is a walk through the table. Memory grows with the square of the node
+    count; see memory_cost.
+    """
+
+    def __init__(self, roadmap, processes=None, chunk_size=64):
+        self.roadmap = roadmap
+        # every pair is solved, so a lazy roadmap is checked in full first
+        roadmap = roadmap.validated()
+        num_nodes = roadmap.num_nodes
+        self.next_hop = np.empty((num_nodes, num_nodes), self.index_dtype(num_nodes))
+        self.distance = np.empty((num_nodes, num_nodes), dtype=np.float32)
+
+        graph = (roadmap.indptr, roadmap.indices, roadmap.weights)
+        chunks = [
+            list(range(start, min(start + chunk_size, num_nodes)))
+            for start in range(0, num_nodes, chunk_size)
+        ]
+        if processes is None:
+            processes = os.cpu_count() or 1
+        if processes <= 1 or len(chunks) <= 1:
+            _init_worker(*graph)
+            results = map(_solve_sources, chunks)
+            self._store(results)
+        else:
+            with ProcessPoolExecutor(
+                max_workers=processes, initializer=_init_worker, initargs=graph
+            ) as executor:
+                self._store(executor.map(_solve_sources, chunks))
+
+    def _store(self, results):
+        for sources, next_rows, dist_rows in results:
+            self.next_hop[sources] = next_rows
+            self.distance[sources] = dist_rows
+
+    @staticmethod
+    def index_dtype(num_nodes):
+        return np.int16 if num_nodes <= np.iinfo(np.int16).max else np.int32
+
+    @staticmethod
+    def memory_cost(num_nodes):
+        """Bytes the tables take for a roadmap of num_nodes nodes."""
+        itemsize = np.dtype(AllPairsTable.index_dtype(num_nodes)).itemsize + 4
+        return num_nodes * num_nodes * itemsize
+
+    @property
+    def nbytes(self):
+        return self.next_hop.nbytes + self.distance.nbytes
+
+    def path(self, start_idx, goal_idx):
+        """Node indices from start_idx to goal_idx, [] if unreachable."""
+        if self.next_hop[start_idx, goal_idx] < 0:
+            return []
+        # every hop of the walk reads the goal's column
+        towards_goal = self.next_hop[:, goal_idx].tolist()
+        path = [start_idx]
+        # the cap guards against cycles through zero-length edges
+        while path[-1] != goal_idx and len(path) <= len(towards_goal):
+            path.append(towards_goal[path[-1]])
+        return path
@@ -0,0 +1,101 @@
+"""
+A* scaling on synthetic roadmaps of 200, 2k and 20k nodes, comparing the heap
+PriorityQueue against the old dict-scanning one.
+
+Run from the repository root: python -m benchmarks.astar_scaling
+"""
+
+import argparse
+import random
+import time
+import numpy as np
+import utils
+
+
+class ScanPriorityQueue(utils.PriorityQueue):
+    """The previous queue: pop scans every queued item for the minimum."""
+
+    def put(self, item, value):
+        self._dict[item] = value
+
+    def remove(self, item):
+        self._dict.pop(item, None)
+
+    def pop(self):
+        if not self._dict:
+            raise IndexError("pop from empty priority queue")
+        tar = self.order(self._dict, key=lambda k: self.f(self._dict[k]))
+        del self._dict[tar]
+        return tar
+
+
+def lattice_roadmap(num_nodes, spacing=10.0, seed=0):
+    """Jittered square lattice where every node links to its 8 neighbours."""
+    rng = random.Random(seed)
+    side = int(np.ceil(np.sqrt(num_nodes)))
+    points = []
+    for k in range(num_nodes):
+        row, col = divmod(k, side)
+        points.append(
+            (
+                col * spacing + rng.uniform(-0.3, 0.3) * spacing,
+                row * spacing + rng.uniform(-0.3, 0.3) * spacing,
+            )
+        )
+    roadmap = {}
+    for k in range(num_nodes):
+        row, col = divmod(k, side)
+        roadmap[k] = []
+        for dr in (-1, 0, 1):
+            for dc in (-1, 0, 1):
+                r, c = row + dr, col + dc
+                other = r * side + c
+                if (dr or dc) and 0 <= r and 0 <= c < side and other < num_nodes:
+                    roadmap[k].append(other)
+    return roadmap, points
+
+
+def time_queries(roadmap, points, queries, queue_cls):
+    original = utils.PriorityQueue
+    utils.PriorityQueue = queue_cls
+    try:
+        start = time.perf_counter()
+        for start_idx, goal_idx in queries:
+            utils.find_path(start_idx, roadmap, points, points[goal_idx])
+        return (time.perf_counter() - start) / len(queries)
+    finally:
+        utils.PriorityQueue = original
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 2000, 20000])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument(
+        "--scan-limit",
+        type=int,
+        default=2000,
+        help="largest roadmap the old O(n^2) queue is timed on",
+    )
+    args = parser.parse_args()
+
+    print(f"{'nodes':>8} {'heap ms':>10} {'scan ms':>10} {'speedup':>8}")
+    for size in args.sizes:
+        roadmap, points = lattice_roadmap(size)
+        rng = random.Random(size)
+        queries = [
+            (rng.randrange(size), rng.randrange(size)) for _ in range(args.queries)
+        ]
+        heap_time = time_queries(roadmap, points, queries, utils.PriorityQueue)
+        if size <= args.scan_limit:
+            scan_time = time_queries(roadmap, points, queries, ScanPriorityQueue)
+            print(
+                f"{size:>8} {heap_time * 1e3:>10.2f} {scan_time * 1e3:>10.2f}"
+                f" {scan_time / heap_time:>7.1f}x"
+            )
+        else:
+            print(f"{size:>8} {heap_time * 1e3:>10.2f} {'-':>10} {'-':>8}")
+
+
+if __name__ == "__main__":
+    main()
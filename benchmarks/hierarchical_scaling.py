@@ -0,0 +1,75 @@
+"""
+HierarchicalRoadmap against flat A* (find_path) on synthetic roadmaps of 2k,
+20k and 50k nodes; at 50k the map covers about 20 times the game's area.
+
+Run from the repository root: python -m benchmarks.hierarchical_scaling
+"""
+
+import argparse
+import random
+import time
+import numpy as np
+from benchmarks.astar_scaling import lattice_roadmap
+from hierarchical import HierarchicalRoadmap
+from roadmap import Roadmap
+from utils import find_path
+
+
+def path_length(points, path):
+    return float(np.linalg.norm(np.diff(points[path], axis=0), axis=1).sum())
+
+
+def time_queries(search, queries):
+    start = time.perf_counter()
+    paths = [search(start_idx, goal_idx) for start_idx, goal_idx in queries]
+    return (time.perf_counter() - start) / len(queries), paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2000, 20000, 50000])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--spacing", type=float, default=20.0)
+    parser.add_argument("--cluster-size", type=float, default=250)
+    args = parser.parse_args()
+
+    print(
+        f"{'nodes':>8} {'build s':>8} {'portals':>8} {'flat ms':>9}"
+        f" {'hpa ms':>8} {'cached ms':>10} {'speedup':>8} {'length':>7}"
+    )
+    for size in args.sizes:
+        adjacency, points = lattice_roadmap(size, args.spacing)
+        roadmap = Roadmap.from_adjacency(adjacency, points)
+        points = roadmap.points
+        rng = random.Random(size)
+        queries = [
+            (rng.randrange(size), rng.randrange(size)) for _ in range(args.queries)
+        ]
+
+        start = time.perf_counter()
+        hierarchy = HierarchicalRoadmap(roadmap, args.cluster_size)
+        build_time = time.perf_counter() - start
+
+        flat_time, flat_paths = time_queries(
+            lambda s, g: find_path(s, roadmap, points, points[g]), queries
+        )
+        hpa_time, hpa_paths = time_queries(hierarchy.path, queries)
+        # the same queries again, with every refinement cached
+        cached_time, _ = time_queries(hierarchy.path, queries)
+        ratio = np.mean(
+            [
+                path_length(points, hpa) / max(path_length(points, flat), 1e-9)
+                for flat, hpa in zip(flat_paths, hpa_paths)
+                if len(flat) > 1
+            ]
+        )
+        print(
+            f"{size:>8} {build_time:>8.2f} {hierarchy.num_portals:>8}"
+            f" {flat_time * 1e3:>9.2f} {hpa_time * 1e3:>8.2f}"
+            f" {cached_time * 1e3:>10.2f} {flat_time / hpa_time:>7.1f}x"
+            f" {ratio:>7.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+build_roadmap on the maze with edge validation on 1 to N worker processes,
+against the serial build, checking that every build gives the same roadmap.
+
+Run from the repository root: python -m benchmarks.roadmap_build
+"""
+
+import argparse
+import os
+import time
+import numpy as np
+from obstacles import load_obstacles
+from simulation import map_scaling
+from utils import build_roadmap
+
+
+def timed_build(obstacles, num_points, radius, min_dist, workers, seed=0):
+    scaling = map_scaling(obstacles, 1000, 1000)
+    start = time.perf_counter()
+    roadmap, _ = build_roadmap(
+        num_points,
+        radius,
+        (1000, 1000),
+        obstacles,
+        *scaling,
+        seed=seed,
+        min_dist=min_dist,
+        workers=workers,
+    )
+    return roadmap, time.perf_counter() - start
+
+
+def same_roadmap(a, b):
+    return all(
+        np.array_equal(getattr(a, name), getattr(b, name))
+        for name in ("points", "indptr", "indices", "weights")
+    )
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 2000, 5000])
+    parser.add_argument("--radius", type=float, default=150)
+    parser.add_argument("--min-dist", type=float, default=5)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=sorted({2, 4, cores} - {1}),
+    )
+    args = parser.parse_args()
+    obstacles = load_obstacles("maze.csv")
+
+    print(f"{cores} cores")
+    print(f"{'points':>8} {'workers':>8} {'build s':>9} {'speedup':>8} {'same':>5}")
+    for size in args.sizes:
+        serial, serial_time = timed_build(
+            obstacles, size, args.radius, args.min_dist, None
+        )
+        print(f"{size:>8} {'serial':>8} {serial_time:>9.3f} {'1.0x':>8} {'-':>5}")
+        for workers in args.workers:
+            roadmap, elapsed = timed_build(
+                obstacles, size, args.radius, args.min_dist, workers
+            )
+            print(
+                f"{size:>8} {workers:>8} {elapsed:>9.3f}"
+                f" {serial_time / elapsed:>7.1f}x {str(same_roadmap(serial, roadmap)):>5}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Ticks per second of N chasers on the maze, moved by the vectorized
+EnemySwarm step against one Enemy object per chaser.
+
+Run from the repository root: python -m benchmarks.swarm_scaling
+"""
+
+import argparse
+import time
+import numpy as np
+from obstacles import load_obstacles, to_screen
+from simulation import Simulation
+from enemy import Enemy
+from swarm import EnemySwarm, CHASE
+from utils import update_enemy_path
+
+
+def chaser_starts(sim, num_chasers, seed):
+    rng = np.random.default_rng(seed)
+    points = np.asarray(sim.points, dtype=float)
+    return points[rng.integers(len(points), size=num_chasers)]
+
+
+def time_swarm(sim, starts, goal, ticks):
+    swarm = EnemySwarm()
+    for start in starts:
+        swarm.add(start, speed=2, mode=CHASE)
+    screen_obstacles = to_screen(
+        sim.obstacles, sim.scale_x, sim.scale_y, sim.offset_x, sim.offset_y
+    )
+    start = time.perf_counter()
+    for _ in range(ticks):
+        sim.distance_field.update(sim.roadmap.index.nearest(goal))
+        swarm.plan(sim.roadmap, sim.distance_field)
+        swarm.step(screen_obstacles, agent_grid=swarm.agent_grid())
+    return ticks / (time.perf_counter() - start)
+
+
+def time_objects(sim, starts, goal, ticks):
+    swarm = EnemySwarm()
+    enemies = []
+    for start in starts:
+        enemy = Enemy(start, swarm=swarm)
+        enemy.set_params(2, True, None)
+        enemy.set_roadmap(sim.roadmap, sim.points)
+        enemies.append(enemy)
+    start = time.perf_counter()
+    for tick in range(ticks):
+        agent_grid = swarm.agent_grid()
+        for enemy in enemies:
+            update_enemy_path(
+                enemy,
+                goal,
+                sim.roadmap,
+                sim.points,
+                distance_field=sim.distance_field,
+            )
+            enemy.update_position(
+                sim.obstacles,
+                sim.scale_x,
+                sim.scale_y,
+                sim.offset_x,
+                sim.offset_y,
+                agent_grid,
+                tick * 1000 // sim.fps,
+                goal,
+                lambda: False,
+            )
+    return ticks / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--ticks", type=int, default=30)
+    parser.add_argument(
+        "--object-limit",
+        type=int,
+        default=100,
+        help="most chasers the per-object loop is timed with",
+    )
+    args = parser.parse_args()
+
+    sim = Simulation(load_obstacles("maze.csv"), seed=0)
+    goal = np.array(sim.player.start_position, dtype=float)
+
+    print(f"{'chasers':>8} {'swarm tps':>10} {'object tps':>11} {'speedup':>8}")
+    for size in args.sizes:
+        starts = chaser_starts(sim, size, size)
+        swarm_tps = time_swarm(sim, starts, goal, args.ticks)
+        if size <= args.object_limit:
+            object_tps = time_objects(sim, starts, goal, args.ticks)
+            print(
+                f"{size:>8} {swarm_tps:>10.1f} {object_tps:>11.1f}"
+                f" {swarm_tps / object_tps:>7.1f}x"
+            )
+        else:
+            print(f"{size:>8} {swarm_tps:>10.1f} {'-':>11} {'-':>8}")
+
+
+if __name__ == "__main__":
+    main()
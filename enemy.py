@@ -1,51 +1,134 @@
 import pygame
 import numpy as np
 import random
-from math import sin, cos, pi
-from utils import scale_points
+from obstacles import to_screen
+from roadmap import Roadmap
+from qlearning import make_q_table, load_q_table, ReplayBuffer, update_batch
+from swarm import EnemySwarm, EXTERNAL
 
 red = (255, 0, 0)
 
 
 class Enemy(pygame.sprite.Sprite):
 
-    def __init__(self, start_pos):
+    def __init__(self, start_pos, swarm=None):
         super().__init__()
         self.surf = pygame.Surface((25, 25))
         self.surf.fill(red)
         self.rect = self.surf.get_rect(center=(200, 300))
-        self.position = np.array(start_pos, dtype=float)
+        # position and speed live in a row of the swarm's arrays; an enemy
+        # on its own gets a swarm of one
+        self.swarm = swarm if swarm is not None else EnemySwarm(capacity=1)
+        self.swarm_index = self.swarm.add(start_pos, speed=2, mode=EXTERNAL)
         self.destination = None
         self.path = []
         self.points = []
         self.roadmap = []
-        self.speed = 2
         self.radius = 5
-        self.get_other_enemies_positions = None
+        # whether the swarm target is the first node of path
+        self.on_path = False
         self.following_roadmap = False
         self.locked_on_path = False
         self.locked_time = 0
         self.last_position = np.array(start_pos, dtype=float)
 
+        # opt in to incremental (D* Lite) replanning in update_enemy_path
+        self.use_incremental_planner = False
+        self.planner = None
+        # microseconds per frame for anytime (ARA*) planning, None to disable
+        self.planning_budget_us = None
+        # node indices of a path planned in the background, swapped into
+        # path when it arrives
+        self.next_path = None
+
         # Q-learning attributes
         self.is_qlearning = False
-        self.q_table = np.zeros((1000, 1000, 8))  # Adjust grid size and actions
+        # the table is only allocated when first used, so enemies that do
+        # not learn never pay for it. q_cell_size pixels make one state
+        self.q_storage = "sparse"
+        self.q_dtype = np.float32
+        self.q_cell_size = 1
+        self.q_area = (1000, 1000)
+        self._q_table = None
         self.learning_rate = 0.1
         self.discount_factor = 0.95
         self.epsilon = 0.2
+        # the learned action only steers with a trained table; without one
+        # the enemy follows its path
+        self.q_steering = False
+        # state and action of the step in flight, learned from in settle
+        self.q_state = None
+        self.q_action = None
+        # transitions go to a replay buffer and are learned from in
+        # minibatches of replay_batch_size every replay_every transitions
+        self.replay = None
+        self.replay_capacity = 10000
+        self.replay_batch_size = 32
+        self.replay_every = 4
         self.actions = [(0, -1), (0, 1), (-1, 0), (1, 0), (-1, -1), (-1, 1), (1, -1), (1, 1)]
 
+    @property
+    def position(self):
+        return self.swarm.positions[self.swarm_index]
+
+    @position.setter
+    def position(self, position):
+        self.swarm.positions[self.swarm_index] = position
+
+    @property
+    def speed(self):
+        return self.swarm.speeds[self.swarm_index]
+
+    @speed.setter
+    def speed(self, speed):
+        self.swarm.speeds[self.swarm_index] = speed
+
+    @property
+    def q_table(self):
+        if self._q_table is None:
+            shape = (
+                -(-self.q_area[0] // self.q_cell_size),
+                -(-self.q_area[1] // self.q_cell_size),
+            )
+            self._q_table = make_q_table(
+                self.q_storage, shape, len(self.actions), self.q_dtype
+            )
+        return self._q_table
+
+    @q_table.setter
+    def q_table(self, table):
+        self._q_table = table
+
+    def load_trained_q_table(self, path):
+        """
+        Steer by a table trained offline, without exploring; its shape sets
+        the state cell size.
+        """
+        table = load_q_table(path)
+        self.q_cell_size = -(-self.q_area[0] // table.values.shape[0])
+        self.q_table = table
+        self.q_steering = True
+        self.epsilon = 0.0
+
     def discretize_state(self, position):
         # Convert continuous position to discrete grid state
-        grid_x = int(position[0])  # Adjust division factor based on screen size
-        grid_y = int(position[1])  # and desired grid size
+        grid_x = int(position[0] // self.q_cell_size)
+        grid_y = int(position[1] // self.q_cell_size)
         return (grid_x, grid_y)
 
-    def choose_action(self, state):
+    def choose_action(self, state, default=None):
         if np.random.rand() < self.epsilon:
             return np.random.randint(8)  # Explore action space
-        else:
-            return np.argmax(self.q_table[state])  # Exploit learned values
+        values = self.q_table[state]
+        if default is not None and not values.any():
+            return default  # Nothing learned for this state yet
+        return int(np.argmax(values))  # Exploit learned values
+
+    def action_towards(self, point):
+        """The action whose direction is closest to the one towards point."""
+        directions = np.array(self.actions, dtype=float)
+        directions /= np.linalg.norm(directions, axis=1)[:, None]
+        return int(np.argmax(directions @ (np.asarray(point) - self.position)))
 
     def update_q_value(self, state, action, reward, next_state):
         future_rewards = np.max(self.q_table[next_state])
@@ -54,6 +137,24 @@ class Enemy(pygame.sprite.Sprite):
         self.q_table[state + (action,)] = new_q
 
 
+    def remember(self, state, action, reward, next_state):
+        if self.replay is None:
+            self.replay = ReplayBuffer(self.replay_capacity)
+        self.replay.add(state, action, reward, next_state)
+        if self.replay.position % self.replay_every == 0:
+            self.learn()
+
+    def learn(self):
+        """One minibatch update from the replay buffer."""
+        if len(self.replay) == 0:
+            return
+        update_batch(
+            self.q_table,
+            *self.replay.sample(self.replay_batch_size),
+            self.learning_rate,
+            self.discount_factor,
+        )
+
     def next_q_move(self, action):
         # Implement how the enemy moves based on the chosen action
         dx, dy = self.actions[action]
@@ -85,80 +186,80 @@ class Enemy(pygame.sprite.Sprite):
         scale_y,
         offset_x,
         offset_y,
-        get_other_enemies_positions,
+        agent_grid,
         current_time,
         player_position,
         is_player_hiding,
     ):
-        self.get_other_enemies_positions = get_other_enemies_positions
+        """
+        Steer, move and settle this enemy on its own, with agent_grid the
+        tick's AgentGrid over its swarm. The Simulation does the three steps
+        for every enemy at once around one EnemySwarm.step.
+        """
+        self.steer(current_time, player_position, is_player_hiding)
+        self.swarm.step(
+            to_screen(obstacles, scale_x, scale_y, offset_x, offset_y),
+            np.array([self.swarm_index]),
+            agent_grid,
+        )
+        self.settle(player_position)
+
+    def steer(self, current_time, player_position, is_player_hiding):
+        """Set the swarm target this enemy heads for in the coming step."""
         self.current_time = current_time
+        self.on_path = False
+        target = None
 
         if is_player_hiding():
-            self.patrol(obstacles, scale_x, scale_y, offset_x, offset_y)
-            return
-
-        if not self.path:
-            return
-
-        if self.locked_on_path and self.current_time <= self.locked_time:
-            self.move_along_path(obstacles, scale_x, scale_y, offset_x, offset_y)
-
-        elif not self.locked_on_path or self.current_time > self.locked_time:
-            self.locked_on_path = False
-            destination = np.array(self.path[0])
-            direction = destination - self.position
-            distance_to_destination = np.linalg.norm(direction)
-
-            if distance_to_destination < self.speed:
-                self.position = destination
-                self.rect.center = self.position
-                if len(self.path) > 0:
-                    self.path.pop(0)
-            else:
-                direction_norm = direction / distance_to_destination
-                new_position = self.position + direction_norm * self.speed
-
-                if self.is_qlearning:
-                    current_state = self.discretize_state(self.position)
-                    action = self.choose_action(current_state)
-                    next_state = self.discretize_state( self.next_q_move(action) )
-                    reward = self.get_reward(player_position)
-                    self.update_q_value(current_state, action, reward, next_state)
-
-                if not self.collides_with_obstacles(
-                    new_position, obstacles, scale_x, scale_y, offset_x, offset_y
-                ):
-                    self.position = new_position
-                    self.rect.center = self.position
-                else:
-                    if not self.following_roadmap:
-                        self.set_nearest_roadmap_path(player_position)
-
-        self.last_position = np.array(self.position)
-
-    def move_along_path(self, obstacles, scale_x, scale_y, offset_x, offset_y):
-        if len(self.path) > 0:
-            destination = np.array(self.path[0])
-            direction = destination - self.position
-            new_position = (
-                self.position + direction / np.linalg.norm(direction) * self.speed
-            )
-
-        if not self.collides_with_obstacles(
-            new_position, obstacles, scale_x, scale_y, offset_x, offset_y
-        ):
-            self.position = new_position
-            self.rect.center = self.position
-
-            if np.linalg.norm(direction) < self.speed:
+            target = self.patrol()
+
+        elif self.path:
+            if self.locked_on_path and self.current_time > self.locked_time:
+                self.locked_on_path = False
+            self.on_path = True
+            target = np.array(self.path[0], dtype=float)
+
+            distance_to_destination = np.linalg.norm(target - self.position)
+            if (
+                self.is_qlearning
+                and self.q_steering
+                and not self.locked_on_path
+                and distance_to_destination >= self.speed
+            ):
+                # the learned action steers; where the table knows nothing
+                # yet, the action towards the next roadmap node stands in
+                self.q_state = self.discretize_state(self.position)
+                self.q_action = self.choose_action(
+                    self.q_state, self.action_towards(target)
+                )
+                target = self.position + self.next_q_move(self.q_action) * self.speed
+
+        self.swarm.targets[self.swarm_index] = np.nan if target is None else target
+
+    def settle(self, player_position):
+        """
+        Follow up on the swarm step: learn from the action taken, pop a
+        reached node or replan.
+        """
+        if self.q_state is not None:
+            reward = self.get_reward(player_position)
+            next_state = self.discretize_state(self.position)
+            self.remember(self.q_state, self.q_action, reward, next_state)
+            self.q_state = None
+        if self.on_path:
+            if self.swarm.blocked[self.swarm_index]:
+                if not self.locked_on_path and not self.following_roadmap:
+                    self.set_nearest_roadmap_path(player_position)
+            elif np.array_equal(self.position, self.path[0]):
                 self.path.pop(0)
+        self.rect.center = self.position
+        self.last_position = np.array(self.position)
 
     def set_nearest_roadmap_path(self, player_position):
-        if self.points:
-            closest_indices = sorted(
-                range(len(self.points)),
-                key=lambda i: np.linalg.norm(self.position - np.array(self.points[i])),
-            )[:5]
+        if len(self.points):
+            closest_indices = [
+                int(i) for i in self.point_index.query_knn(self.position, 5)
+            ]
 
         if self.is_qlearning:
             states = [self.discretize_state(np.array(self.points[i])) for i in closest_indices]
@@ -181,7 +282,7 @@ class Enemy(pygame.sprite.Sprite):
                 self.path = [self.points[best_index]]
                 reward = self.get_reward(player_position)
                 next_state = self.discretize_state(np.array(self.path[0]))
-                self.update_q_value(current_state, best_action, reward, next_state)
+                self.remember(current_state, best_action, reward, next_state)
             else:
                 self.path = [self.points[closest_indices[0]]] 
         else:
@@ -189,48 +290,15 @@ class Enemy(pygame.sprite.Sprite):
             self.locked_on_path = True
             self.locked_time = self.current_time + 3000
 
-    def collides_with_obstacles(
-        self, new_position, obstacles, scale_x, scale_y, offset_x, offset_y
-    ):
-        num_points = 100
-        angles = np.linspace(0, 2 * pi, num_points, endpoint=False)
-        points = [
-            (
-                self.radius * cos(angle) + new_position[0],
-                self.radius * sin(angle) + new_position[1],
-            )
-            for angle in angles
-        ]
-
-        for obstacle in obstacles:
-            scaled_obstacle = scale_points(
-                obstacle.points, scale_x, scale_y, offset_x, offset_y
-            )
-            obstacle_rect = pygame.Rect(
-                min(p[0] for p in scaled_obstacle),
-                min(p[1] for p in scaled_obstacle),
-                max(p[0] for p in scaled_obstacle) - min(p[0] for p in scaled_obstacle),
-                max(p[1] for p in scaled_obstacle) - min(p[1] for p in scaled_obstacle),
-            )
-
-            for point in points:
-                if obstacle_rect.collidepoint(point):
-                    return True
-
-        if self.get_other_enemies_positions:
-            other_enemies_positions = self.get_other_enemies_positions()
-            for pos in other_enemies_positions:
-                if np.linalg.norm(new_position - np.array(pos)) < self.radius * 2:
-                    return True
-
-        return False
-
     def set_roadmap(self, roadmap, points):
-        self.roadmap_indices = list(roadmap.keys())
-        unique_points_indices = set(self.roadmap_indices)
-        for connected_points in roadmap.values():
-            unique_points_indices.update(connected_points)
-        self.points = [points[i] for i in unique_points_indices]
+        # the roadmap, its points and their index are shared by every enemy
+        if not isinstance(roadmap, Roadmap):
+            roadmap = Roadmap.from_adjacency(roadmap, points)
+        self.roadmap_graph = roadmap
+        self.points = roadmap.points
+        self.point_index = roadmap.index
+        # a path still in flight was planned on the old roadmap
+        self.next_path = None
 
     def start_following_roadmap(self):
         if self.roadmap:
@@ -244,18 +312,12 @@ class Enemy(pygame.sprite.Sprite):
     def stop_following_roadmap(self):
         self.following_roadmap = False
 
-    def patrol(self, obstacles, scale_x, scale_y, offset_x, offset_y):
+    def patrol(self):
         # Example simple patrol method: change direction randomly
         if (
             not hasattr(self, "patrol_direction") or random.randint(0, 20) == 0
         ):  # Change direction occasionally
             self.patrol_direction = (random.uniform(-1, 1), random.uniform(-1, 1))
 
-        # Move in the chosen direction
-        new_position = self.position + np.array(self.patrol_direction) * self.speed
-        # Check if moving would cause a collision
-        if not self.collides_with_obstacles(
-            new_position, obstacles, scale_x, scale_y, offset_x, offset_y
-        ):
-            self.position = new_position
-            self.rect.center = self.position
+        # Head one step in the chosen direction
+        return self.position + np.array(self.patrol_direction) * self.speed
@@ -2,8 +2,9 @@ import pygame
 import sys
 from utils import *
 from obstacles import load_obstacles
-from player import Player
-from enemy import Enemy
+from player import keys_to_move
+from simulation import Simulation, CAUGHT, WON
+from roadmap_cache import RoadmapCache
 
 white = (255, 255, 255)
 blue = (0, 0, 255)
@@ -12,9 +13,6 @@ gray = (128, 128, 128)
 black = (0, 0, 0)
 green = (0, 255, 0)
 gold = (255, 215, 0)
-enemy_slow_start_pos = [250, 300]
-enemy_fast_start_pos = [300, 500]
-enemy_qlearning_start_pos = [700, 400]
 
 pygame.init()
 font = pygame.font.Font(None, 74)
@@ -22,21 +20,6 @@ screen_width, screen_height = 1000, 1000
 screen = pygame.display.set_mode((screen_width, screen_height))
 obstacles = load_obstacles("maze.csv")
 
-# map and scaling parameters
-map_x_min = min(obstacle.x_min for obstacle in obstacles)
-map_x_max = max(obstacle.x_max for obstacle in obstacles)
-map_y_min = min(obstacle.y_min for obstacle in obstacles)
-map_y_max = max(obstacle.y_max for obstacle in obstacles)
-
-scale_x = screen_width / (map_x_max - map_x_min)
-scale_y = screen_height / (map_y_max - map_y_min)
-offset_x = -map_x_min * scale_x
-offset_y = -map_y_min * scale_y
-
-timer_start = 60
-timer = timer_start
-last_count = pygame.time.get_ticks()
-
 
 # menu helper fns
 def quit_or_reset():
@@ -106,66 +89,56 @@ def pause_screen():
     return pause_or_reset()
 
 
+def draw_frame(sim, show_roadmap):
+    screen.fill(white)
+    for obstacle in sim.obstacles:
+        scaled_obstacle = scale_points(
+            obstacle.points, sim.scale_x, sim.scale_y, sim.offset_x, sim.offset_y
+        )
+        pygame.draw.polygon(screen, gray, scaled_obstacle)
+
+    for spot in sim.hiding_spots:
+        screen.blit(spot.image, spot.rect)
+
+    # # NOTE:uncommment debug line for enemy pathfinding
+    # for i in range(len(sim.enemy_slow.path) - 1):
+    #     pygame.draw.line(screen, pygame.Color('red'), sim.enemy_slow.path[i], sim.enemy_slow.path[i + 1], 5)
+
+    # for i in range(len(sim.enemy_fast.path) - 1):
+    #     pygame.draw.line(screen, pygame.Color('green'), sim.enemy_fast.path[i], sim.enemy_fast.path[i + 1], 5)
+
+    # timer updates
+    timer_text = font.render(str(sim.timer), True, black)
+    text_rect = timer_text.get_rect(center=(screen_width // 2, 50))
+
+    # player updates
+    screen.blit(timer_text, text_rect)
+    screen.blit(sim.player.image, sim.player.rect)
+
+    # enemy display updates
+    for enemy in sim.enemies:
+        screen.blit(enemy.surf, enemy.rect)
+    for x, y in sim.swarm.positions[sim.chasers]:
+        pygame.draw.rect(screen, red, (x, y, 25, 25))
+
+    if show_roadmap:
+        draw_prm_roadmap(screen, sim.roadmap, sim.points)
+
+
 def main():
-    # player char
-    player = Player()
-
-    # slow enemy agent (prm)
-    enemy_slow = Enemy(start_pos=enemy_slow_start_pos)
-    enemy_slow.set_params(1, True, None)
-
-    # fast enemy agent (prm)
-    enemy_fast = Enemy(start_pos=enemy_fast_start_pos)
-    enemy_fast.set_params(2, True, None)
-
-    # faster enemy agent (prm)
-    # enemy_faster = Enemy(start_pos=enemy_faster_start_pos)
-    # enemy_faster.set_params(3, True, None)
-
-    # faster enemy agent (prm)
-    enemy_qlearning = Enemy(start_pos=enemy_qlearning_start_pos)
-    enemy_qlearning.set_params(3, True, None)
-    enemy_qlearning.is_qlearning = True
-    enemy_qlearning.surf.fill(green)
-
-    last_update_time = 0
-    path_update_interval = 1000
-
-    players = pygame.sprite.Group()
-    players.add(player)
-    enemies = pygame.sprite.Group()
-    enemies.add(enemy_slow)
-    enemies.add(enemy_fast)
-    # enemies.add(enemy_faster)
-    enemies.add(enemy_qlearning)
-    clock = pygame.time.Clock()
-    global timer, last_count
-
-    num_points = 200
-    connection_radius = 200
-    game_area = (screen_width, screen_height)
-    roadmap, points = build_roadmap(
-        num_points,
-        connection_radius,
-        game_area,
+    # plan on a worker process so searches never stall a frame, and keep
+    # a few roadmaps on disk so launching and pressing R skip the build
+    sim = Simulation(
         obstacles,
-        scale_x,
-        scale_y,
-        offset_x,
-        offset_y,
+        screen_size=(screen_width, screen_height),
+        planner_workers=1,
+        roadmap_cache=RoadmapCache(),
+        roadmap_variants=4,
+        q_table_path="qtable.npy",
     )
-
-    for enemy in enemies:
-        enemy.set_roadmap(roadmap, points)
-
+    clock = pygame.time.Clock()
     show_roadmap = False
 
-    def enemies_reset():
-        enemy_slow.reset(enemy_slow_start_pos)
-        enemy_fast.reset(enemy_fast_start_pos)
-        # enemy_faster.reset(enemy_faster_start_pos)
-        enemy_qlearning.reset(enemy_qlearning_start_pos)
-
     while True:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -177,129 +150,26 @@ def main():
                 if event.key == pygame.K_p:
                     choice = pause_screen()
                     if choice:
-                        enemies_reset()
-                        timer = timer_start
+                        sim.reset_enemies()
+                        sim.reset_timer()
                 elif event.key == pygame.K_r:
-                    enemies_reset()
-                    roadmap, points = build_roadmap(
-                        num_points,
-                        connection_radius,
-                        game_area,
-                        obstacles,
-                        scale_x,
-                        scale_y,
-                        offset_x,
-                        offset_y,
-                    )
-                    for enemy in enemies:
-                        enemy.set_roadmap(roadmap, points)
-                    timer = timer_start
-
-        pressed_keys = pygame.key.get_pressed()
-
-        hiding_spots = pygame.sprite.Group(
-            HidingSpot(400, 265, 50, 50), HidingSpot(500, 400, 50, 50)
-        )
+                    sim.reset_enemies()
+                    sim.rebuild_roadmap()
+                    sim.reset_timer()
 
-        player.update(
-            pressed_keys, obstacles, hiding_spots, scale_x, scale_y, offset_x, offset_y
-        )
+        outcome = sim.step(keys_to_move(pygame.key.get_pressed()))
+        draw_frame(sim, show_roadmap)
 
-        screen.fill(white)
-        for obstacle in obstacles:
-            scaled_obstacle = scale_points(
-                obstacle.points, scale_x, scale_y, offset_x, offset_y
-            )
-            pygame.draw.polygon(screen, gray, scaled_obstacle)
-
-        for spot in hiding_spots:
-            screen.blit(spot.image, spot.rect)
-
-        current_time = pygame.time.get_ticks()
-        if current_time - last_count >= 1000:
-            timer -= 1
-            last_count = current_time
-
-        player_pos = player.position
-        for enemy in enemies:
-            update_enemy_path(enemy, player_pos, roadmap, points)
-
-        # # NOTE:uncommment debug line for enemy pathfinding
-        # for i in range(len(enemy_slow.path) - 1):
-        #     pygame.draw.line(screen, pygame.Color('red'), enemy_slow.path[i], enemy_slow.path[i + 1], 5)
-
-        # for i in range(len(enemy_fast.path) - 1):
-        #     pygame.draw.line(screen, pygame.Color('green'), enemy_fast.path[i], enemy_fast.path[i + 1], 5)
-
-        # for i in range(len(enemy_fast.path) - 1):
-        #     pygame.draw.line(screen, pygame.Color('bkye'), enemy_faster.path[i], enemy_faster.path[i + 1], 5)
-
-        # speedup at 30 secs
-        if timer == 30:
-            enemy_slow.set_params(3, True, None)
-
-        player_pos = player.position
-        # Update each enemy with the new logic
-        for enemy in enemies:
-            enemy.update(player_pos)
-
-        for enemy in enemies:
-            other_enemies_positions = lambda e=enemy: [
-                e.position for e in enemies if e != enemy
-            ]
-            enemy.update_position(
-                obstacles,
-                scale_x,
-                scale_y,
-                offset_x,
-                offset_y,
-                other_enemies_positions,
-                current_time,
-                player.position,
-                lambda: player.is_hiding
-            )
-
-        # timer updates
-        timer_text = font.render(str(timer), True, black)
-        text_rect = timer_text.get_rect(center=(screen_width // 2, 50))
-
-        # player updates
-        screen.blit(timer_text, text_rect)
-        screen.blit(player.image, player.rect)
-
-        # enemy display updates
-        for enemy in enemies:
-            scaled_enemy_pos = scale_points(
-                [enemy.position], scale_x, scale_y, offset_x, offset_y
-            )[0]
-            enemy.rect.x, enemy.rect.y = scaled_enemy_pos
-            enemy.rect.x, enemy.rect.y = enemy.position
-            screen.blit(enemy.surf, enemy.rect)
-
-        if show_roadmap:
-            draw_prm_roadmap(screen, roadmap, points)
-
-        if (
-            pygame.sprite.collide_rect(player, enemy_slow)
-            or pygame.sprite.collide_rect(player, enemy_fast)
-            # or pygame.sprite.collide_rect(player, enemy_faster)
-            or pygame.sprite.collide_rect(player, enemy_qlearning)
-        ):
+        if outcome == CAUGHT:
             restart_screen()
-            player.reset()
-            enemies_reset()
-            enemy_slow.set_params(1, True, None)
-            timer = timer_start
+            sim.reset_round()
 
         pygame.display.flip()
-        clock.tick(30)
+        clock.tick(sim.fps)
 
-        if timer <= 0:
+        if outcome == WON:
             win_screen()
-            player.reset()
-            enemies_reset()
-            enemy_slow.set_params(1, True, None)
-            timer = timer_start
+            sim.reset_round()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,244 @@
+import heapq
+import math
+import numpy as np
+
+
+def _neighbor_lists(roadmap):
+    """Per node, the list of (neighbor, edge length) pairs."""
+    indptr = roadmap.indptr.tolist()
+    indices, weights = roadmap.indices.tolist(), roadmap.weights.tolist()
+    return [
+        list(
+            zip(indices[indptr[i] : indptr[i + 1]], weights[indptr[i] : indptr[i + 1]])
+        )
+        for i in range(len(indptr) - 1)
+    ]
+
+
+def _search(graph, cluster_of, cluster, sources, target=None):
+    """
+    Dijkstra over the nodes of one cluster from sources, a dict of node to
+    starting cost, stopping early once target is settled. Returns the
+    distance and parent dicts.
+    """
+    dist = dict(sources)
+    parent = dict.fromkeys(sources)
+    heap = [(d, node) for node, d in sources.items()]
+    heapq.heapify(heap)
+    while heap:
+        d, current = heapq.heappop(heap)
+        if d > dist[current]:
+            continue
+        if current == target:
+            break
+        for next_idx, weight in graph[current]:
+            if cluster_of[next_idx] != cluster:
+                continue
+            new_dist = d + weight
+            if new_dist < dist.get(next_idx, math.inf):
+                dist[next_idx] = new_dist
+                parent[next_idx] = current
+                heapq.heappush(heap, (new_dist, next_idx))
+    return dist, parent
+
+
+def _unwind(parent, node):
+    path = [node]
+    while parent[path[-1]] is not None:
+        path.append(parent[path[-1]])
+    path.reverse()
+    return path
+
+
+class HierarchicalRoadmap:
+    """
+    Two-level roadmap for HPA*-style search on large maps. Nodes are grouped
+    into square clusters of cluster_size pixels. Between two clusters only
+    a few crossing edges are kept, up to entrance_portals per entrance (a
+    pair of connected pieces on the two sides), spread from one end of the
+    entrance to the other, and their endpoints are the portals. The path
+    costs between the portals of each cluster are precomputed, so a query
+    searches the small abstract graph of portals first and then refines
+    only the clusters along its route. Refined legs are cached per portal
+    pair. Paths can be a little longer than the shortest ones, since they
+    cross clusters at portals only.
+    """
+
+    def __init__(self, roadmap, cluster_size=250, entrance_portals=3):
+        self.roadmap = roadmap
+        # searches read plain neighbor lists, so lazy edges are checked first
+        roadmap = roadmap.validated()
+        self.cluster_size = cluster_size
+        self.entrance_portals = entrance_portals
+        points = roadmap.points
+        num_nodes = roadmap.num_nodes
+        cells = np.zeros((num_nodes, 2), dtype=np.int64)
+        if num_nodes:
+            cells = np.floor((points - points.min(axis=0)) / cluster_size)
+            cells = cells.astype(np.int64)
+        cluster = cells[:, 1] * (cells[:, 0].max(initial=0) + 1) + cells[:, 0]
+        self.cluster = cluster
+        self._cluster_of = cluster.tolist()
+        self._points = points.tolist()
+        self._graph = _neighbor_lists(roadmap)
+        self._reverse_graph = _neighbor_lists(roadmap.transpose())
+
+        sources, targets, weights = roadmap.edges()
+        crossing = cluster[sources] != cluster[targets]
+        sources, targets = sources[crossing], targets[crossing]
+        weights = weights[crossing]
+        keep = self._entrances(points, cells, sources, targets)
+        sources, targets = sources[keep], targets[keep]
+        weights = weights[keep]
+
+        self.portals = np.unique(np.concatenate((sources, targets)))
+        self._cluster_portals = {}
+        for portal in self.portals.tolist():
+            self._cluster_portals.setdefault(self._cluster_of[portal], []).append(
+                portal
+            )
+        self._abstract = {portal: [] for portal in self.portals.tolist()}
+        for u, v, w in zip(sources.tolist(), targets.tolist(), weights.tolist()):
+            self._abstract[u].append((v, w))
+        for cluster_id, portals in self._cluster_portals.items():
+            for portal in portals:
+                dist, _ = _search(
+                    self._graph, self._cluster_of, cluster_id, {portal: 0.0}
+                )
+                self._abstract[portal].extend(
+                    (other, dist[other])
+                    for other in portals
+                    if other != portal and other in dist
+                )
+        self._refined = {}
+
+    def _entrances(self, points, cells, sources, targets):
+        """
+        Which crossing edges to keep: per entrance, entrance_portals edges
+        evenly spread along the cluster border, the first and last included.
+        """
+        if len(sources) == 0:
+            return np.zeros(0, dtype=bool)
+        piece = np.asarray(self._pieces())
+        pairs = np.stack((piece[sources], piece[targets]), axis=1)
+        _, group = np.unique(pairs, axis=0, return_inverse=True)
+        group = group.ravel()
+        # position along the border: y where the clusters sit side by side,
+        # x where one is above the other
+        midpoints = (points[sources] + points[targets]) / 2
+        side_by_side = cells[sources, 0] != cells[targets, 0]
+        along = np.where(side_by_side, midpoints[:, 1], midpoints[:, 0])
+        order = np.lexsort((along, group))
+        counts = np.bincount(group)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        keep = np.zeros(len(sources), dtype=bool)
+        for start, count in zip(starts.tolist(), counts.tolist()):
+            picks = np.linspace(0, count - 1, min(self.entrance_portals, count))
+            keep[order[start + np.round(picks).astype(int)]] = True
+        return keep
+
+    def _pieces(self):
+        """Per node, a label of its connected piece within its cluster."""
+        cluster_of = self._cluster_of
+        piece = [-1] * len(cluster_of)
+        for seed in range(len(cluster_of)):
+            if piece[seed] >= 0:
+                continue
+            piece[seed] = seed
+            stack = [seed]
+            while stack:
+                current = stack.pop()
+                for next_idx, _ in self._graph[current]:
+                    if piece[next_idx] < 0 and cluster_of[next_idx] == cluster_of[seed]:
+                        piece[next_idx] = seed
+                        stack.append(next_idx)
+        return piece
+
+    @property
+    def num_clusters(self):
+        return len(np.unique(self.cluster))
+
+    @property
+    def num_portals(self):
+        return len(self.portals)
+
+    def _refine(self, portal, other):
+        """Nodes after portal on its path to other in the same cluster."""
+        key = (portal, other)
+        if key not in self._refined:
+            _, parent = _search(
+                self._graph,
+                self._cluster_of,
+                self._cluster_of[portal],
+                {portal: 0.0},
+                other,
+            )
+            self._refined[key] = _unwind(parent, other)[1:]
+        return self._refined[key]
+
+    def path(self, start_idx, goal_idx):
+        """Node indices from start_idx to goal_idx, [] if unreachable."""
+        cluster_of = self._cluster_of
+        start_cluster = cluster_of[start_idx]
+        goal_cluster = cluster_of[goal_idx]
+        start_dist, start_parent = _search(
+            self._graph, cluster_of, start_cluster, {start_idx: 0.0}
+        )
+        # a goal reachable inside the start's cluster is the route to beat;
+        # the portals are searched for a shorter way round
+        best, best_exit = start_dist.get(goal_idx, math.inf), None
+        # costs from every portal of the goal's cluster to the goal
+        goal_dist, goal_next = _search(
+            self._reverse_graph, cluster_of, goal_cluster, {goal_idx: 0.0}
+        )
+        exits = {
+            portal: goal_dist[portal]
+            for portal in self._cluster_portals.get(goal_cluster, [])
+            if portal in goal_dist
+        }
+
+        # A* over the portals, entered from the start's cluster
+        gx, gy = self._points[goal_idx]
+        points = self._points
+        cost = {}
+        came_from = {}
+        heap = []
+        for portal in self._cluster_portals.get(start_cluster, []):
+            if portal in start_dist:
+                cost[portal] = start_dist[portal]
+                came_from[portal] = None
+                x, y = points[portal]
+                h = math.hypot(x - gx, y - gy)
+                heap.append((cost[portal] + h, cost[portal], portal))
+        heapq.heapify(heap)
+        while heap:
+            f, d, current = heapq.heappop(heap)
+            if f >= best:
+                break
+            if d > cost[current]:
+                continue
+            if current in exits and d + exits[current] < best:
+                best, best_exit = d + exits[current], current
+            for next_idx, weight in self._abstract[current]:
+                new_cost = d + weight
+                if new_cost < cost.get(next_idx, math.inf):
+                    cost[next_idx] = new_cost
+                    came_from[next_idx] = current
+                    x, y = points[next_idx]
+                    h = math.hypot(x - gx, y - gy)
+                    heapq.heappush(heap, (new_cost + h, new_cost, next_idx))
+        if best_exit is None:
+            if best < math.inf:
+                return _unwind(start_parent, goal_idx)
+            return []
+
+        portals = _unwind(came_from, best_exit)
+        path = _unwind(start_parent, portals[0])
+        for portal, other in zip(portals, portals[1:]):
+            if cluster_of[portal] == cluster_of[other]:
+                path.extend(self._refine(portal, other))
+            else:
+                path.append(other)
+        while path[-1] != goal_idx:
+            path.append(goal_next[path[-1]])
+        return path
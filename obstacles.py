@@ -1,4 +1,6 @@
 import csv
+import numpy as np
+from spatial import ObstacleGrid
 
 
 class BoxObstacle(object):
@@ -27,6 +29,223 @@ class BoxObstacle(object):
         return x_min_scaled <= x <= x_max_scaled and y_min_scaled <= y <= y_max_scaled
 
 
+class ObstacleSet(object):
+    """
+    The box obstacles of a map with their AABBs stored as an (M, 4) array of
+    x_min, y_min, x_max, y_max rows, so containment and overlap queries run
+    as one vectorized call. Queries go through a uniform grid broadphase,
+    built on first use, and only test the boxes in the cells they touch.
+    """
+
+    def __init__(self, obstacles, cell_size=None):
+        self.obstacles = list(obstacles)
+        self.cell_size = cell_size
+        self._grid = None
+        self.bounds = np.array(
+            [[o.x_min, o.y_min, o.x_max, o.y_max] for o in self.obstacles],
+            dtype=float,
+        ).reshape(-1, 4)
+        self._scaled = {}
+
+    def __iter__(self):
+        return self.obstacles.__iter__()
+
+    def __len__(self):
+        return self.obstacles.__len__()
+
+    def __getitem__(self, index):
+        return self.obstacles.__getitem__(index)
+
+    @property
+    def grid(self):
+        if self._grid is None:
+            self._grid = ObstacleGrid(self.bounds, self.cell_size)
+        return self._grid
+
+    def scaled(self, scale_x, scale_y, offset_x, offset_y):
+        """The same obstacles in screen space, cached per scaling."""
+        key = (scale_x, scale_y, offset_x, offset_y)
+        if key not in self._scaled:
+            self._scaled[key] = ObstacleSet(
+                BoxObstacle(
+                    [
+                        (x * scale_x + offset_x, y * scale_y + offset_y)
+                        for x, y in obstacle.points
+                    ]
+                )
+                for obstacle in self.obstacles
+            )
+            if self.cell_size is not None:
+                self._scaled[key].cell_size = self.cell_size * max(
+                    abs(scale_x), abs(scale_y)
+                )
+        return self._scaled[key]
+
+    def contains_points(self, points):
+        """For each of the N x 2 points, whether it lies in any obstacle."""
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        queries, boxes = self.grid.query_points(points)
+        x = points[queries, 0]
+        y = points[queries, 1]
+        b = self.bounds[boxes]
+        inside = (b[:, 0] <= x) & (x <= b[:, 2]) & (b[:, 1] <= y) & (y <= b[:, 3])
+        return _any_per_query(len(points), queries, inside)
+
+    def boxes_collide(self, points, size):
+        """
+        For each of the N x 2 points, whether the box of the given
+        (width, height) centered on it overlaps any obstacle.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        half_size = np.array([size[0] / 2, size[1] / 2])
+        lo = points - half_size
+        hi = points + half_size
+        queries, boxes = self.grid.query_boxes(lo, hi)
+        lo = lo[queries]
+        hi = hi[queries]
+        b = self.bounds[boxes]
+        overlap = (
+            (b[:, 0] <= hi[:, 0])
+            & (lo[:, 0] <= b[:, 2])
+            & (b[:, 1] <= hi[:, 1])
+            & (lo[:, 1] <= b[:, 3])
+        )
+        return _any_per_query(len(points), queries, overlap)
+
+    def circles_collide(self, centers, radius):
+        """For each of the N x 2 centers, whether the circle overlaps any box."""
+        centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+        queries, boxes = self.grid.query_circles(centers, radius)
+        overlap = circle_aabb_overlap(centers[queries], radius, self.bounds[boxes])
+        return _any_per_query(len(centers), queries, overlap)
+
+    def sweep_circles(self, starts, ends, radius):
+        """
+        For each circle moving from starts[i] to ends[i], the fraction of the
+        move at which it first touches a box, or inf if the move is clear.
+        """
+        starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+        ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+        queries, boxes = self.grid.query_segments(starts, ends, radius)
+        times = sweep_circle_aabb(
+            starts[queries],
+            ends[queries] - starts[queries],
+            radius,
+            self.bounds[boxes],
+        )
+        first_contact = np.full(len(starts), np.inf)
+        np.minimum.at(first_contact, queries, times)
+        return first_contact
+
+    def sweep_boxes(self, starts, ends, size):
+        """
+        For each box of the given (width, height) moving from starts[i] to
+        ends[i], whether it touches any obstacle on the way. Exact: the
+        segment is slab-tested against the obstacles inflated by half the
+        moving box.
+        """
+        starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+        ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+        half_size = np.array([size[0] / 2, size[1] / 2])
+        queries, boxes = self.grid.query_segments(starts, ends, half_size.max())
+        inflated = self.bounds[boxes] + np.concatenate((-half_size, half_size))
+        hits = segment_aabb_hit(
+            starts[queries], ends[queries] - starts[queries], inflated
+        )
+        return _any_per_query(len(starts), queries, hits)
+
+    def circle_path_blocked(self, start, end, radius):
+        """Whether a circle moving from start to end hits any box on the way."""
+        return bool(self.sweep_circles(start, end, radius)[0] <= 1)
+
+
+def _any_per_query(num_queries, queries, hits):
+    result = np.zeros(num_queries, dtype=bool)
+    result[queries[hits]] = True
+    return result
+
+
+def circle_aabb_overlap(centers, radius, bounds):
+    """Exact circle/AABB test via the closest point of the box to the center."""
+    closest_x = np.clip(centers[..., 0], bounds[..., 0], bounds[..., 2])
+    closest_y = np.clip(centers[..., 1], bounds[..., 1], bounds[..., 3])
+    dist_sq = (centers[..., 0] - closest_x) ** 2 + (centers[..., 1] - closest_y) ** 2
+    return dist_sq < radius * radius
+
+
+def _slab(start, delta, lo, hi):
+    """Entry and exit times of the line start + t * delta through [lo, hi]."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t1 = (lo - start) / delta
+        t2 = (hi - start) / delta
+    parallel = delta == 0
+    inside = (lo <= start) & (start <= hi)
+    t_in = np.where(parallel, np.where(inside, -np.inf, np.inf), np.minimum(t1, t2))
+    t_out = np.where(parallel, np.where(inside, np.inf, -np.inf), np.maximum(t1, t2))
+    return t_in, t_out
+
+
+def segment_aabb_hit(starts, deltas, bounds):
+    """Whether the segments start + t * delta, t in [0, 1], touch the boxes."""
+    tx_in, tx_out = _slab(
+        starts[..., 0], deltas[..., 0], bounds[..., 0], bounds[..., 2]
+    )
+    ty_in, ty_out = _slab(
+        starts[..., 1], deltas[..., 1], bounds[..., 1], bounds[..., 3]
+    )
+    t_enter = np.maximum(tx_in, ty_in)
+    t_exit = np.minimum(tx_out, ty_out)
+    return (t_enter <= t_exit) & (t_exit >= 0) & (t_enter <= 1)
+
+
+def sweep_circle_aabb(starts, deltas, radius, bounds):
+    """
+    Time of first contact in [0, 1] of circles moving by deltas against the
+    boxes, inf where there is none. The segment is clipped against the box
+    inflated by the radius; if it enters through a corner region, it is
+    tested against the circle around that corner instead.
+    """
+    x_min = bounds[..., 0]
+    y_min = bounds[..., 1]
+    x_max = bounds[..., 2]
+    y_max = bounds[..., 3]
+    sx, sy = starts[..., 0], starts[..., 1]
+    dx, dy = deltas[..., 0], deltas[..., 1]
+
+    tx_in, tx_out = _slab(sx, dx, x_min - radius, x_max + radius)
+    ty_in, ty_out = _slab(sy, dy, y_min - radius, y_max + radius)
+    t_enter = np.maximum(tx_in, ty_in)
+    t_exit = np.minimum(tx_out, ty_out)
+    hit = (t_enter <= t_exit) & (t_exit >= 0) & (t_enter <= 1)
+    t_hit = np.clip(t_enter, 0, 1)
+
+    qx = sx + t_hit * dx
+    qy = sy + t_hit * dy
+    corner = ((qx < x_min) | (qx > x_max)) & ((qy < y_min) | (qy > y_max))
+
+    # segment against the corner circle
+    mx = sx - np.where(qx < x_min, x_min, x_max)
+    my = sy - np.where(qy < y_min, y_min, y_max)
+    a = dx * dx + dy * dy
+    b = mx * dx + my * dy
+    c = mx * mx + my * my - radius * radius
+    disc = b * b - a * c
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_circle = (-b - np.sqrt(np.maximum(disc, 0))) / a
+    t_circle = np.where(c < 0, 0.0, t_circle)
+    circle_hit = (c < 0) | ((a > 0) & (disc >= 0) & (t_circle >= 0) & (t_circle <= 1))
+
+    hit &= ~corner | circle_hit
+    return np.where(hit, np.where(corner, t_circle, t_hit), np.inf)
+
+
+def to_screen(obstacles, scale_x, scale_y, offset_x, offset_y):
+    """Screen space ObstacleSet for an ObstacleSet or a list of BoxObstacles."""
+    if not isinstance(obstacles, ObstacleSet):
+        obstacles = ObstacleSet(obstacles)
+    return obstacles.scaled(scale_x, scale_y, offset_x, offset_y)
+
+
 def load_obstacles(filename):
     obstacles = []
     with open(filename, "r") as csvfile:
@@ -37,4 +256,4 @@ def load_obstacles(filename):
                     (float(row[i]), float(row[i + 1])) for i in range(0, 8, 2)
                 ]
                 obstacles.append(BoxObstacle(obstacle_points))
-    return obstacles
+    return ObstacleSet(obstacles)
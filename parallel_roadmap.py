@@ -0,0 +1,99 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from obstacles import BoxObstacle, ObstacleSet
+
+# arrays of the build being validated, attached once per worker process
+_shared = None
+
+
+def _share(array):
+    """Copy array into a new shared memory block; returns it and its spec."""
+    array = np.ascontiguousarray(array)
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+    return block, (block.name, array.shape, array.dtype.str)
+
+
+def _attach(spec):
+    name, shape, dtype = spec
+    # workers share the parent's resource tracker, and the parent unlinks
+    # the block once the pool is done
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype, buffer=block.buf)
+
+
+def _init_worker(bounds, points, first, second, valid, size, cell_size):
+    global _shared
+    blocks, arrays = zip(*map(_attach, (bounds, points, first, second, valid)))
+    bounds = arrays[0]
+    obstacles = ObstacleSet(
+        BoxObstacle([(x0, y0), (x1, y0), (x1, y1), (x0, y1)])
+        for x0, y0, x1, y1 in bounds.tolist()
+    )
+    obstacles.cell_size = cell_size
+    # the blocks stay referenced so the arrays keep their memory
+    _shared = (blocks, obstacles) + arrays[1:] + (size,)
+
+
+def _validate_range(start, stop):
+    _, obstacles, points, first, second, valid, size = _shared
+    valid[start:stop] = ~obstacles.sweep_boxes(
+        points[first[start:stop]], points[second[start:stop]], size
+    )
+    return start, stop
+
+
+def validate_edges_parallel(
+    points,
+    first,
+    second,
+    screen_obstacles,
+    workers=None,
+    chunk_size=4096,
+    size=(25, 25),
+):
+    """
+    Same as utils.validate_edges for the edges from points[first[i]] to
+    points[second[i]], with the edges split into chunks of chunk_size
+    across worker processes (workers of them, one per core by default).
+    Points, edges and obstacle boxes reach the workers through shared
+    memory instead of being pickled, and each chunk writes its own slice
+    of the result, so the answer does not depend on the worker count or on
+    which chunk finishes first.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    num_edges = len(first)
+    if num_edges == 0:
+        return np.zeros(0, dtype=bool)
+    blocks = []
+    try:
+        specs = []
+        for array in (
+            screen_obstacles.bounds,
+            np.asarray(points, dtype=float),
+            np.asarray(first, dtype=np.int64),
+            np.asarray(second, dtype=np.int64),
+            np.zeros(num_edges, dtype=bool),
+        ):
+            block, spec = _share(array)
+            blocks.append(block)
+            specs.append(spec)
+        ranges = [
+            (start, min(start + chunk_size, num_edges))
+            for start in range(0, num_edges, chunk_size)
+        ]
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=tuple(specs) + (tuple(size), screen_obstacles.cell_size),
+        ) as executor:
+            list(executor.map(_validate_range, *zip(*ranges)))
+        _, shape, dtype = specs[-1]
+        return np.ndarray(shape, dtype, buffer=blocks[-1].buf).copy()
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
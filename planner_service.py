@@ -0,0 +1,77 @@
+from concurrent.futures import ProcessPoolExecutor
+from roadmap import Roadmap
+
+# search state of the worker process, set by _init_worker
+_field = None
+
+
+def _init_worker(points, indptr, indices, weights):
+    global _field
+    from utils import DistanceField
+
+    _field = DistanceField(Roadmap(points, indptr, indices, weights))
+
+
+def _plan(start_idx, goal_idx):
+    # requests for the same goal reuse the worker's distance field
+    _field.update(goal_idx)
+    return _field.path_from(start_idx)
+
+
+class PlannerService:
+    """
+    Plans enemy paths on a pool of worker processes so the game loop never
+    waits for a search. request() queues a (start node, goal node) search
+    for an enemy and poll() hands back the paths that have finished. Each
+    enemy has at most one search running; newer requests replace a queued
+    one, since only the latest start and goal matter.
+    """
+
+    def __init__(self, roadmap, workers=1):
+        self.roadmap = roadmap
+        # workers get plain arrays, so lazy edges are checked up front
+        roadmap = roadmap.validated()
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(roadmap.points, roadmap.indptr, roadmap.indices, roadmap.weights),
+        )
+        self.running = {}
+        self.queued = {}
+        self.last_request = {}
+
+    def request(self, enemy_id, start_idx, goal_idx):
+        """Ask for a new path; repeats of the last request are ignored."""
+        if self.last_request.get(enemy_id) == (start_idx, goal_idx):
+            return
+        self.last_request[enemy_id] = (start_idx, goal_idx)
+        if enemy_id in self.running:
+            self.queued[enemy_id] = (start_idx, goal_idx)
+        else:
+            self._submit(enemy_id, start_idx, goal_idx)
+
+    def _submit(self, enemy_id, start_idx, goal_idx):
+        self.running[enemy_id] = self.executor.submit(_plan, start_idx, goal_idx)
+
+    def poll(self):
+        """Finished paths as a dict of enemy id to node indices."""
+        results = {}
+        for enemy_id, future in list(self.running.items()):
+            if not future.done():
+                continue
+            del self.running[enemy_id]
+            results[enemy_id] = future.result()
+            if enemy_id in self.queued:
+                self._submit(enemy_id, *self.queued.pop(enemy_id))
+        return results
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.running.clear()
+        self.queued.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,228 @@
+import numpy as np
+
+
+class DenseQTable:
+    """
+    Q-values in one (width, height, actions) array. table[x, y] is the row
+    of action values of a state and table[x, y, a] a single value, as with
+    the plain NumPy array enemies used to hold.
+    """
+
+    def __init__(self, shape, num_actions=8, dtype=np.float32, values=None):
+        if values is None:
+            values = np.zeros(tuple(shape) + (num_actions,), dtype=dtype)
+        self.values = values
+
+    def __getitem__(self, key):
+        return self.values[key]
+
+    def __setitem__(self, key, value):
+        self.values[key] = value
+
+    def rows_of(self, states):
+        """Action-value rows of an (N, 2) array of states."""
+        return self.values[states[:, 0], states[:, 1]]
+
+    def set_values(self, states, actions, values):
+        self.values[states[:, 0], states[:, 1], actions] = values
+
+    @property
+    def num_actions(self):
+        return self.values.shape[-1]
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+    @property
+    def num_states(self):
+        return int(np.any(self.values != 0, axis=-1).sum())
+
+
+class SparseQTable:
+    """
+    Q-values kept per visited state, so memory grows with the states an
+    enemy actually reaches. The rows live in one growable array and a
+    sorted array of state keys maps states to rows, so batches of states
+    are looked up and written with fancy indexing. Unvisited states read
+    as all zeros. Indexed like DenseQTable.
+    """
+
+    def __init__(self, shape=None, num_actions=8, dtype=np.float32, capacity=1024):
+        self.shape = shape
+        self.dtype = np.dtype(dtype)
+        self._num_actions = num_actions
+        self.count = 0
+        self.values = np.zeros((capacity, num_actions), dtype=self.dtype)
+        self.states = np.zeros((capacity, 2), dtype=np.int64)
+        # sorted state keys and the row of each
+        self._keys = np.zeros(0, dtype=np.int64)
+        self._rows = np.zeros(0, dtype=np.int64)
+
+    @staticmethod
+    def _key(states):
+        states = np.asarray(states, dtype=np.int64).reshape(-1, 2)
+        return (states[:, 0] << 32) + states[:, 1]
+
+    def _find(self, keys):
+        """Row of every key, -1 for states not visited yet."""
+        if len(self._keys) == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+        slots = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+        return np.where(self._keys[slots] == keys, self._rows[slots], -1)
+
+    def _rows_for(self, states):
+        """Rows of an (N, 2) array of states, adding rows for new ones."""
+        keys = self._key(states)
+        rows = self._find(keys)
+        missing = rows < 0
+        if missing.any():
+            new_keys, first = np.unique(keys[missing], return_index=True)
+            new_rows = np.arange(self.count, self.count + len(new_keys))
+            if new_rows[-1] >= len(self.values):
+                self._grow(max(2 * len(self.values), new_rows[-1] + 1))
+            self.states[new_rows] = np.asarray(states)[missing][first]
+            self.count += len(new_keys)
+            slots = np.searchsorted(self._keys, new_keys)
+            self._keys = np.insert(self._keys, slots, new_keys)
+            self._rows = np.insert(self._rows, slots, new_rows)
+            rows = self._find(keys)
+        return rows
+
+    def _grow(self, capacity):
+        for name in ("values", "states"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[: self.count] = old[: self.count]
+            setattr(self, name, new)
+
+    def __getitem__(self, key):
+        row = self._find(self._key(key[:2]))[0]
+        if row < 0:
+            row = np.zeros(self._num_actions, dtype=self.dtype)
+        else:
+            row = self.values[row]
+        return row if len(key) == 2 else row[key[2]]
+
+    def __setitem__(self, key, value):
+        row = self._rows_for(np.array([key[:2]]))[0]
+        if len(key) == 2:
+            self.values[row] = value
+        else:
+            self.values[row, key[2]] = value
+
+    def rows_of(self, states):
+        """Action-value rows of an (N, 2) array of states."""
+        rows = self._find(self._key(states))
+        values = np.zeros((len(rows), self._num_actions), dtype=self.dtype)
+        visited = rows >= 0
+        values[visited] = self.values[rows[visited]]
+        return values
+
+    def set_values(self, states, actions, values):
+        # rows first: adding them may replace the values array
+        rows = self._rows_for(states)
+        self.values[rows, actions] = values
+
+    @property
+    def num_actions(self):
+        return self._num_actions
+
+    def to_dense(self):
+        table = DenseQTable(self.shape, self._num_actions, self.dtype)
+        states = self.states[: self.count]
+        table.values[states[:, 0], states[:, 1]] = self.values[: self.count]
+        return table
+
+    @property
+    def nbytes(self):
+        # the rows in use, their states and the key index
+        row_bytes = self._num_actions * self.dtype.itemsize + 4 * 8
+        return self.count * row_bytes
+
+    @property
+    def num_states(self):
+        return self.count
+
+
+Q_STORAGES = {
+    "dense": DenseQTable,
+    "sparse": SparseQTable,
+}
+
+
+def make_q_table(storage, shape, num_actions=8, dtype=np.float32):
+    """A Q-table of the named storage ("dense" or "sparse")."""
+    if storage not in Q_STORAGES:
+        raise KeyError(
+            f"unknown Q-table storage {storage!r}, expected one of {sorted(Q_STORAGES)}"
+        )
+    return Q_STORAGES[storage](shape, num_actions, dtype)
+
+
+class ReplayBuffer:
+    """
+    Fixed-capacity ring buffer of (state, action, reward, next_state)
+    transitions in NumPy arrays; once full, the oldest ones are overwritten.
+    """
+
+    def __init__(self, capacity=10000):
+        self.capacity = capacity
+        self.states = np.zeros((capacity, 2), dtype=np.int32)
+        self.actions = np.zeros(capacity, dtype=np.int8)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros((capacity, 2), dtype=np.int32)
+        self.count = 0
+        self.position = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, state, action, reward, next_state):
+        i = self.position
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.position = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def sample(self, batch_size):
+        """A uniform random minibatch, drawn with replacement."""
+        rows = np.random.randint(0, self.count, size=batch_size)
+        return (
+            self.states[rows],
+            self.actions[rows],
+            self.rewards[rows],
+            self.next_states[rows],
+        )
+
+
+def update_batch(
+    table, states, actions, rewards, next_states, learning_rate, discount_factor
+):
+    """
+    One Q-learning step for a whole minibatch. Where a state-action pair
+    repeats in the batch, the last of its updates is kept.
+    """
+    future_rewards = table.rows_of(next_states).max(axis=1)
+    current_q = table.rows_of(states)[np.arange(len(actions)), actions]
+    new_q = current_q + learning_rate * (
+        rewards + discount_factor * future_rewards - current_q
+    )
+    table.set_values(states, actions, new_q)
+
+
+def save_q_table(path, table):
+    """Write a Q-table's values as a .npy file; sparse tables go dense."""
+    if isinstance(table, SparseQTable):
+        table = table.to_dense()
+    np.save(path, table.values)
+
+
+def load_q_table(path, mmap_mode="c"):
+    """
+    A DenseQTable memory-mapped from a .npy file. The default copy-on-write
+    mode lets the game keep learning without touching the file.
+    """
+    return DenseQTable(None, values=np.load(path, mmap_mode=mmap_mode))
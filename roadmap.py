@@ -0,0 +1,250 @@
+import os
+import numpy as np
+from spatial import PointGrid
+
+
+class Roadmap(object):
+    """
+    A roadmap graph in compressed sparse row form: the neighbors of node i
+    are indices[indptr[i]:indptr[i + 1]], with the matching edge lengths in
+    weights. points is the N x 2 array of node positions. All arrays are
+    read-only so one Roadmap can be shared by every enemy.
+
+    The dict-style methods (roadmap[i], keys, values, items) keep code
+    written for the old dict[int, list[int]] roadmap working.
+
+    A lazy roadmap (one built with an edge_checker) holds candidate edges
+    that have not been collision checked. valid_neighbors checks them the
+    first time a search reaches them and remembers the result, shared with
+    the transpose.
+    """
+
+    def __init__(
+        self, points, indptr, indices, weights=None, index=None, edge_checker=None
+    ):
+        self.points = np.asarray(points, dtype=float).reshape(-1, 2)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        if weights is None:
+            sources = np.repeat(np.arange(len(self.points)), np.diff(self.indptr))
+            weights = np.linalg.norm(
+                self.points[self.indices] - self.points[sources], axis=1
+            )
+        self.weights = np.asarray(weights, dtype=float)
+        for array in (self.points, self.indptr, self.indices, self.weights):
+            array.flags.writeable = False
+        self._index = index
+        self._transpose = None
+        # lazy edge checking: edge_checker(starts, ends) says which segments
+        # are free; edge_state is 0 unchecked, 1 valid, -1 blocked
+        self.edge_checker = edge_checker
+        self.edge_state = None
+        self._state_slots = None
+        self._mirror = None
+        if edge_checker is not None:
+            self.edge_state = np.zeros(len(self.indices), dtype=np.int8)
+
+    @classmethod
+    def from_edges(
+        cls, points, sources, targets, weights=None, index=None, edge_checker=None
+    ):
+        """Build from directed edge arrays; neighbors end up sorted."""
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        order = np.lexsort((targets, sources))
+        sources, targets = sources[order], targets[order]
+        if weights is not None:
+            weights = np.asarray(weights, dtype=float)[order]
+        num_nodes = len(np.asarray(points).reshape(-1, 2))
+        indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=num_nodes), out=indptr[1:])
+        return cls(points, indptr, targets, weights, index, edge_checker)
+
+    @classmethod
+    def from_adjacency(cls, adjacency, points, index=None):
+        """Build from a dict[int, list[int]] roadmap, keeping neighbor order."""
+        num_nodes = len(points)
+        counts = np.zeros(num_nodes, dtype=np.int64)
+        for i, neighbors in adjacency.items():
+            counts[i] = len(neighbors)
+        indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        indices = np.zeros(indptr[-1], dtype=np.int32)
+        for i, neighbors in adjacency.items():
+            indices[indptr[i] : indptr[i + 1]] = neighbors
+        return cls(points, indptr, indices, index=index)
+
+    @property
+    def index(self):
+        """Nearest-neighbor index over the points, built on first use."""
+        if self._index is None:
+            self._index = PointGrid(self.points)
+        return self._index
+
+    @property
+    def num_nodes(self):
+        return len(self.points)
+
+    @property
+    def num_edges(self):
+        return len(self.indices)
+
+    @property
+    def nbytes(self):
+        return sum(
+            array.nbytes
+            for array in (self.points, self.indptr, self.indices, self.weights)
+        )
+
+    def neighbors(self, i):
+        return self.indices[self.indptr[i] : self.indptr[i + 1]]
+
+    def neighbor_weights(self, i):
+        return self.weights[self.indptr[i] : self.indptr[i + 1]]
+
+    @property
+    def lazy(self):
+        return self.edge_state is not None
+
+    def valid_neighbors(self, i):
+        """
+        Neighbors of i and the edge weights as lists, leaving out blocked
+        edges. On a lazy roadmap, unchecked edges of i are checked now.
+        """
+        start, end = self.indptr[i], self.indptr[i + 1]
+        neighbors = self.indices[start:end]
+        weights = self.weights[start:end]
+        if self.edge_state is None:
+            return neighbors.tolist(), weights.tolist()
+        if self._state_slots is None:
+            slots = np.arange(start, end)
+        else:
+            slots = self._state_slots[start:end]
+        state = self.edge_state[slots]
+        unknown = state == 0
+        if unknown.any():
+            # segments are checked in whichever direction the search met them
+            ends = self.points[neighbors[unknown]]
+            starts = np.broadcast_to(self.points[i], ends.shape)
+            checked = np.where(self.edge_checker(starts, ends), 1, -1)
+            state[unknown] = checked
+            self.edge_state[slots[unknown]] = checked
+            mirror = self._mirror_slots()[slots[unknown]]
+            has_mirror = mirror >= 0
+            self.edge_state[mirror[has_mirror]] = checked[has_mirror]
+        valid = state > 0
+        return neighbors[valid].tolist(), weights[valid].tolist()
+
+    def _mirror_slots(self):
+        """Slot of the reverse of every edge of the edge_state owner, or -1."""
+        owner = self if self._state_slots is None else self._transpose
+        if owner._mirror is None:
+            sources, targets, _ = owner.edges()
+            keys = sources * owner.num_nodes + targets
+            reverse = targets.astype(np.int64) * owner.num_nodes + sources
+            order = np.argsort(keys, kind="stable")
+            found = np.searchsorted(keys, reverse, sorter=order)
+            found = np.minimum(found, len(keys) - 1)
+            mirror = order[found] if len(keys) else found
+            owner._mirror = np.where(keys[mirror] == reverse, mirror, -1)
+        return owner._mirror
+
+    def validated(self):
+        """
+        A plain roadmap with every edge checked and the blocked ones left
+        out, for consumers that need the whole graph at once.
+        """
+        if self.edge_state is None:
+            return self
+        if self._state_slots is not None:
+            return self._transpose.validated().transpose()
+        unknown = np.flatnonzero(self.edge_state == 0)
+        if len(unknown):
+            sources, targets, _ = self.edges()
+            free = self.edge_checker(
+                self.points[sources[unknown]], self.points[targets[unknown]]
+            )
+            self.edge_state[unknown] = np.where(free, 1, -1)
+        sources, targets, weights = self.edges()
+        keep = self.edge_state > 0
+        return Roadmap.from_edges(
+            self.points, sources[keep], targets[keep], weights[keep], self._index
+        )
+
+    def edges(self):
+        """Directed edges as (sources, targets, weights) arrays."""
+        sources = np.repeat(np.arange(self.num_nodes), np.diff(self.indptr))
+        return sources, self.indices, self.weights
+
+    def segments(self):
+        """(start, end) point pairs of every edge not known to be blocked."""
+        sources, targets, _ = self.edges()
+        if self.edge_state is not None:
+            state = self.edge_state
+            if self._state_slots is not None:
+                state = state[self._state_slots]
+            sources, targets = sources[state >= 0], targets[state >= 0]
+        points = self.points.tolist()
+        return [
+            (points[i], points[j]) for i, j in zip(sources.tolist(), targets.tolist())
+        ]
+
+    def transpose(self):
+        """The roadmap with every edge reversed, built on first use."""
+        if self._transpose is None:
+            sources, targets, weights = self.edges()
+            transpose = Roadmap.from_edges(
+                self.points, targets, sources, weights, self._index
+            )
+            if self.edge_state is not None:
+                # the reversed edges share their check results with ours
+                transpose.edge_checker = self.edge_checker
+                transpose.edge_state = self.edge_state
+                transpose._state_slots = np.lexsort((sources, targets))
+            transpose._transpose = self
+            self._transpose = transpose
+        return self._transpose
+
+    def save(self, directory):
+        """
+        Write the arrays as .npy files into directory, which load() can map
+        straight from disk. Lazy roadmaps are saved with every edge checked.
+        """
+        roadmap = self.validated()
+        os.makedirs(directory, exist_ok=True)
+        for name in ("points", "indptr", "indices", "weights"):
+            np.save(os.path.join(directory, name + ".npy"), getattr(roadmap, name))
+
+    @classmethod
+    def load(cls, directory, mmap_mode="r", index=None):
+        """Read a roadmap written by save(), memory-mapped by default."""
+        arrays = [
+            np.load(os.path.join(directory, name + ".npy"), mmap_mode=mmap_mode)
+            for name in ("points", "indptr", "indices", "weights")
+        ]
+        return cls(*arrays, index=index)
+
+    def to_dict(self):
+        return {i: self[i] for i in range(self.num_nodes)}
+
+    # dict-style access
+    def __getitem__(self, i):
+        return self.neighbors(i).tolist()
+
+    def __len__(self):
+        return self.num_nodes
+
+    def __iter__(self):
+        return iter(range(self.num_nodes))
+
+    def __contains__(self, i):
+        return 0 <= i < self.num_nodes
+
+    def keys(self):
+        return range(self.num_nodes)
+
+    def values(self):
+        return (self[i] for i in range(self.num_nodes))
+
+    def items(self):
+        return ((i, self[i]) for i in range(self.num_nodes))
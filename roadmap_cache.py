@@ -0,0 +1,142 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+import numpy as np
+from roadmap import Roadmap
+from utils import build_roadmap
+
+# bump when build_roadmap changes what it produces for the same parameters
+CACHE_VERSION = 2
+
+
+def roadmap_key(obstacles, *params):
+    """Hash of the obstacle boxes and the build parameters."""
+    bounds = np.array(
+        [(o.x_min, o.y_min, o.x_max, o.y_max) for o in obstacles], dtype=float
+    )
+    digest = hashlib.sha1(bounds.tobytes())
+    digest.update(repr((CACHE_VERSION,) + params).encode())
+    return digest.hexdigest()
+
+
+class RoadmapCache:
+    """
+    Roadmaps stored on disk under directory, one subdirectory of .npy files
+    per key, and memory-mapped back on load. The last max_entries roadmaps
+    used stay in memory, so switching between a few variants is free.
+    """
+
+    def __init__(self, directory=".roadmap_cache", max_entries=4):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def build_roadmap(
+        self,
+        num_points,
+        connection_radius,
+        game_area,
+        obstacles,
+        scale_x,
+        scale_y,
+        offset_x,
+        offset_y,
+        sampler="uniform",
+        seed=None,
+        min_dist=30,
+        extra_edges=0,
+        workers=None,
+    ):
+        """
+        Same as utils.build_roadmap, but only builds roadmaps it has not
+        seen. Roadmaps without a seed or with a sampler function are random
+        or have no stable key, so they are always built. workers does not
+        change the roadmap and is not part of the key.
+        """
+        args = (
+            num_points,
+            connection_radius,
+            game_area,
+            obstacles,
+            scale_x,
+            scale_y,
+            offset_x,
+            offset_y,
+        )
+        if seed is None or callable(sampler):
+            roadmap, points = build_roadmap(
+                *args,
+                sampler=sampler,
+                seed=seed,
+                min_dist=min_dist,
+                extra_edges=extra_edges,
+                workers=workers,
+            )
+            return roadmap, points
+
+        key = roadmap_key(
+            obstacles,
+            num_points,
+            connection_radius,
+            tuple(game_area),
+            scale_x,
+            scale_y,
+            offset_x,
+            offset_y,
+            sampler,
+            seed,
+            min_dist,
+            extra_edges,
+        )
+        roadmap = self.get(key)
+        if roadmap is None:
+            self.misses += 1
+            roadmap, _ = build_roadmap(
+                *args,
+                sampler=sampler,
+                seed=seed,
+                min_dist=min_dist,
+                extra_edges=extra_edges,
+                workers=workers,
+            )
+            self.put(key, roadmap)
+        else:
+            self.hits += 1
+        return roadmap, roadmap.points
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """The roadmap stored under key, or None."""
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        if not os.path.isdir(self._path(key)):
+            return None
+        roadmap = Roadmap.load(self._path(key))
+        self._remember(key, roadmap)
+        return roadmap
+
+    def put(self, key, roadmap):
+        # written to a temporary directory first, so a crash never leaves a
+        # half-written entry behind
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=self.directory)
+        roadmap.save(tmp)
+        try:
+            os.rename(tmp, self._path(key))
+        except OSError:
+            # another process stored the same key first
+            shutil.rmtree(tmp, ignore_errors=True)
+        self._remember(key, roadmap)
+
+    def _remember(self, key, roadmap):
+        self.entries[key] = roadmap
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
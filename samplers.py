@@ -0,0 +1,181 @@
+import numpy as np
+from spatial import PointGrid
+
+
+class _DiskGrid(object):
+    """
+    Background grid of accepted points for minimum distance checks. Cells are
+    min_dist / sqrt(2) wide, so each holds at most one point and a check only
+    looks at the 5 x 5 cells around a candidate.
+    """
+
+    _offsets = np.array([(dx, dy) for dx in range(-2, 3) for dy in range(-2, 3)])
+
+    def __init__(self, game_area, min_dist):
+        self.min_dist = min_dist
+        self.cell_size = max(min_dist / np.sqrt(2), 1e-9)
+        self.shape = np.array(
+            [
+                int(np.ceil(game_area[0] / self.cell_size)) + 1,
+                int(np.ceil(game_area[1] / self.cell_size)) + 1,
+            ]
+        )
+        # two cells of padding so neighborhood lookups never leave the array
+        self.cells = np.full(self.shape + 4, -1, dtype=int)
+        self._points = np.zeros((64, 2))
+        self.count = 0
+
+    @property
+    def points(self):
+        return self._points[: self.count]
+
+    def _cells_of(self, points):
+        cells = (points / self.cell_size).astype(int)
+        return np.minimum(np.maximum(cells, 0), self.shape - 1)
+
+    def free(self, candidates):
+        """Which candidates keep min_dist from every accepted point."""
+        if self.min_dist <= 0 or self.count == 0:
+            return np.ones(len(candidates), dtype=bool)
+        cells = self._cells_of(candidates) + 2
+        ids = self.cells[
+            cells[:, 0, None] + self._offsets[:, 0],
+            cells[:, 1, None] + self._offsets[:, 1],
+        ]
+        queries, slots = np.nonzero(ids >= 0)
+        diff = self._points[ids[queries, slots]] - candidates[queries]
+        close = np.einsum("ij,ij->i", diff, diff) < self.min_dist**2
+        result = np.ones(len(candidates), dtype=bool)
+        result[queries[close]] = False
+        return result
+
+    def add(self, points):
+        needed = self.count + len(points)
+        if needed > len(self._points):
+            grown = np.zeros((max(needed, 2 * len(self._points)), 2))
+            grown[: self.count] = self.points
+            self._points = grown
+        self._points[self.count : needed] = points
+        cells = self._cells_of(points)
+        self.cells[cells[:, 0] + 2, cells[:, 1] + 2] = np.arange(self.count, needed)
+        self.count = needed
+
+    def accept(self, candidates, limit):
+        """
+        Add the candidates that keep min_dist from the accepted points and
+        from each other, greedily in the given order, up to limit of them.
+        Returns the mask of accepted candidates.
+        """
+        accepted = self.free(candidates)
+        survivors = np.flatnonzero(accepted)
+        if self.min_dist > 0 and len(survivors) > 1:
+            first, second = PointGrid(candidates[survivors]).query_pairs(self.min_dist)
+            # a later candidate loses to any earlier accepted one
+            order = np.lexsort((first, second))
+            rejected = np.zeros(len(survivors), dtype=bool)
+            for a, b in zip(first[order].tolist(), second[order].tolist()):
+                if not rejected[a]:
+                    rejected[b] = True
+            accepted[survivors[rejected]] = False
+        accepted[np.flatnonzero(accepted)[limit:]] = False
+        self.add(candidates[accepted])
+        return accepted
+
+
+def uniform_sampler(num_points, game_area, obstacles, rng, min_dist=30, size=(25, 25)):
+    """
+    Uniform samples drawn in batches. Obstacle rejection is one vectorized
+    call per batch; the survivors are accepted in draw order if they keep
+    min_dist from every accepted point. Gives up once the free space is so
+    full that draws stop being accepted, returning fewer points.
+    """
+    grid = _DiskGrid(game_area, min_dist)
+    batch_size = max(num_points, 256)
+    max_draws = 50 * num_points + 10000
+    draws = 0
+    while grid.count < num_points and draws < max_draws:
+        batch = rng.uniform((0, 0), game_area, size=(batch_size, 2))
+        draws += batch_size
+        batch = batch[~obstacles.boxes_collide(batch, size)]
+        grid.accept(batch, num_points - grid.count)
+    return grid.points.copy()
+
+
+def poisson_disk_sampler(
+    num_points,
+    game_area,
+    obstacles,
+    rng,
+    min_dist=30,
+    size=(25, 25),
+    attempts=30,
+    attempts_per_round=6,
+):
+    """
+    Bridson's Poisson-disk sampling, run in rounds over a batch of the active
+    list: every point in the batch draws a few candidates in the annulus
+    [min_dist, 2 * min_dist] around it, all candidates are checked against
+    obstacles and accepted points in one vectorized pass, and a point
+    retires after `attempts` draws in a row without success. Stops at
+    num_points or when the free space is covered.
+    """
+    grid = _DiskGrid(game_area, min_dist)
+    radius = max(min_dist, 1e-9)
+    seeds_left = 10
+    active = np.zeros((0, 2))
+    failures = np.zeros(0, dtype=int)
+    while grid.count < num_points:
+        if len(active) == 0:
+            # (re)seed, e.g. for free regions the annulus jumps cannot reach
+            if seeds_left == 0:
+                break
+            seeds_left -= 1
+            seeds = rng.uniform((0, 0), game_area, size=(64, 2))
+            seeds = seeds[~obstacles.boxes_collide(seeds, size)][:1]
+            active = seeds[grid.accept(seeds, 1)]
+            failures = np.zeros(len(active), dtype=int)
+            continue
+
+        # a random slice of the active list per round keeps batches bounded
+        batch = rng.permutation(len(active))[:4096]
+        owners = np.repeat(batch, attempts_per_round)
+        angles = rng.uniform(0, 2 * np.pi, len(owners))
+        dists = rng.uniform(radius, 2 * radius, len(owners))
+        candidates = active[owners] + np.column_stack(
+            (dists * np.cos(angles), dists * np.sin(angles))
+        )
+        keep = (
+            (candidates[:, 0] >= 0)
+            & (candidates[:, 0] <= game_area[0])
+            & (candidates[:, 1] >= 0)
+            & (candidates[:, 1] <= game_area[1])
+        )
+        keep[keep] = ~obstacles.boxes_collide(candidates[keep], size)
+        shuffle = rng.permutation(np.flatnonzero(keep))
+        candidates, owners = candidates[shuffle], owners[shuffle]
+        accepted = grid.accept(candidates, num_points - grid.count)
+
+        failures[batch] += attempts_per_round
+        failures[owners[accepted]] = 0
+        alive = failures < attempts
+        num_new = int(accepted.sum())
+        active = np.concatenate((active[alive], candidates[accepted]))
+        failures = np.concatenate((failures[alive], np.zeros(num_new, dtype=int)))
+    return grid.points.copy()
+
+
+SAMPLERS = {
+    "uniform": uniform_sampler,
+    "poisson": poisson_disk_sampler,
+}
+
+
+def get_sampler(sampler):
+    """Look up a sampler by name; callables are returned as they are."""
+    if callable(sampler):
+        return sampler
+    if sampler not in SAMPLERS:
+        raise KeyError(
+            f"unknown sampler {sampler!r}, expected one of {sorted(SAMPLERS)}"
+        )
+    return SAMPLERS[sampler]
@@ -0,0 +1,375 @@
+import os
+import random
+import numpy as np
+from utils import (
+    build_roadmap,
+    update_enemy_path,
+    set_enemy_path,
+    DistanceField,
+    HidingSpot,
+)
+from all_pairs import AllPairsTable
+from hierarchical import HierarchicalRoadmap
+from planner_service import PlannerService
+from player import Player
+from enemy import Enemy
+from obstacles import to_screen
+from swarm import EnemySwarm, CHASE
+
+green = (0, 255, 0)
+
+enemy_slow_start_pos = [250, 300]
+enemy_fast_start_pos = [300, 500]
+enemy_qlearning_start_pos = [700, 400]
+# chasers never start closer than this to the player
+chaser_spawn_distance = 200
+
+# outcomes returned by Simulation.step
+CAUGHT = "caught"
+WON = "won"
+
+
+def map_scaling(obstacles, screen_width, screen_height):
+    """Scale and offset that map the obstacle coordinates onto the screen."""
+    map_x_min = min(obstacle.x_min for obstacle in obstacles)
+    map_x_max = max(obstacle.x_max for obstacle in obstacles)
+    map_y_min = min(obstacle.y_min for obstacle in obstacles)
+    map_y_max = max(obstacle.y_max for obstacle in obstacles)
+
+    scale_x = screen_width / (map_x_max - map_x_min)
+    scale_y = screen_height / (map_y_max - map_y_min)
+    offset_x = -map_x_min * scale_x
+    offset_y = -map_y_min * scale_y
+    return scale_x, scale_y, offset_x, offset_y
+
+
+def scripted_controller(moves):
+    """Controller that replays a list of moves, then stands still."""
+    moves = iter(moves)
+    return lambda sim: next(moves, (0, 0))
+
+
+class Simulation:
+    """
+    Headless game core. Owns the player, the enemies, the roadmap and the
+    timer and advances them by fixed ticks of 1000 / fps milliseconds, so it
+    can run as fast as the machine allows. hideseek.py renders on top of it.
+    Roadmaps whose all-pairs tables fit in all_pairs_max_bytes get them
+    precomputed (see AllPairsTable.memory_cost). With planner_workers > 0,
+    paths are planned on that many worker processes and arrive a few ticks
+    late, so runs are no longer reproducible tick for tick. lazy_roadmap
+    defers edge collision checks until a search needs them; enemies then
+    plan with A* searches that stop at the player's node instead of a
+    DistanceField over the whole roadmap, which would check every edge.
+    Chasers need that field, so they cannot be combined with it. A
+    RoadmapCache as roadmap_cache loads roadmaps built before from disk;
+    with roadmap_variants = n, rebuilds cycle through n fixed roadmaps
+    (seeds 0 to n - 1) instead of drawing new ones.
+    extra_edges loop edges survive loop removal as alternative routes.
+    roadmap_workers > 1 validates roadmap edges on that many processes.
+    With cluster_size set, enemies plan on a HierarchicalRoadmap with
+    clusters of that many pixels, meant for maps far larger than the
+    screen.
+    q_table_path names a Q-table trained by train_qlearning.py, used when
+    the file exists. num_chasers adds that many plain chasers at random
+    roadmap nodes, moved together by the EnemySwarm the enemies live in.
+    """
+
+    def __init__(
+        self,
+        obstacles,
+        screen_size=(1000, 1000),
+        num_points=200,
+        connection_radius=200,
+        fps=30,
+        timer_start=60,
+        sampler="uniform",
+        seed=None,
+        all_pairs_max_bytes=0,
+        planner_workers=0,
+        lazy_roadmap=False,
+        roadmap_cache=None,
+        roadmap_variants=None,
+        extra_edges=0,
+        q_table_path=None,
+        num_chasers=0,
+        roadmap_workers=None,
+        cluster_size=None,
+    ):
+        if lazy_roadmap and num_chasers:
+            raise ValueError("chasers need a DistanceField, not a lazy roadmap")
+        if seed is not None:
+            random.seed(seed)
+            np.random.seed(seed)
+
+        self.obstacles = obstacles
+        self.game_area = screen_size
+        self.scale_x, self.scale_y, self.offset_x, self.offset_y = map_scaling(
+            obstacles, screen_size[0], screen_size[1]
+        )
+        self.num_points = num_points
+        self.connection_radius = connection_radius
+        self.sampler = sampler
+        self.all_pairs_max_bytes = all_pairs_max_bytes
+        self.planner_workers = planner_workers
+        self.lazy_roadmap = lazy_roadmap
+        self.roadmap_cache = roadmap_cache
+        self.roadmap_variants = roadmap_variants
+        self.extra_edges = extra_edges
+        self.roadmap_workers = roadmap_workers
+        self.cluster_size = cluster_size
+        self.variant = -1
+        self.rng = np.random.default_rng(seed)
+        self.fps = fps
+        self.timer_start = timer_start
+        self.timer = timer_start
+        self.ticks = 0
+        self.last_count = 0
+
+        self.player = Player()
+        self.swarm = EnemySwarm()
+
+        # slow enemy agent (prm)
+        self.enemy_slow = Enemy(start_pos=enemy_slow_start_pos, swarm=self.swarm)
+        self.enemy_slow.set_params(1, True, None)
+
+        # fast enemy agent (prm)
+        self.enemy_fast = Enemy(start_pos=enemy_fast_start_pos, swarm=self.swarm)
+        self.enemy_fast.set_params(2, True, None)
+
+        # q-learning enemy agent (prm)
+        self.enemy_qlearning = Enemy(
+            start_pos=enemy_qlearning_start_pos, swarm=self.swarm
+        )
+        self.enemy_qlearning.set_params(3, True, None)
+        self.enemy_qlearning.is_qlearning = True
+        self.enemy_qlearning.surf.fill(green)
+
+        if q_table_path is not None and os.path.exists(q_table_path):
+            # trained offline by train_qlearning.py
+            self.enemy_qlearning.load_trained_q_table(q_table_path)
+
+        self.enemies = [self.enemy_slow, self.enemy_fast, self.enemy_qlearning]
+        self.hiding_spots = [
+            HidingSpot(400, 265, 50, 50),
+            HidingSpot(500, 400, 50, 50),
+        ]
+
+        self.roadmap = None
+        self.points = None
+        self.distance_field = None
+        self.all_pairs = None
+        self.hierarchy = None
+        self.planner_service = None
+        self.rebuild_roadmap()
+
+        # chasers start on random roadmap nodes, away from the player
+        self.chaser_starts = np.zeros((num_chasers, 2))
+        if num_chasers:
+            points = np.asarray(self.points, dtype=float)
+            gap = np.linalg.norm(points - self.player.start_position, axis=1)
+            far = points[gap > chaser_spawn_distance]
+            nodes = self.rng.integers(len(far), size=num_chasers)
+            self.chaser_starts[:] = far[nodes]
+        for start in self.chaser_starts:
+            self.swarm.add(start, speed=2, mode=CHASE)
+        self.chasers = self.swarm.members(CHASE)
+
+    @property
+    def current_time(self):
+        """Simulated milliseconds since start, like pygame.time.get_ticks()."""
+        return self.ticks * 1000 // self.fps
+
+    def rebuild_roadmap(self):
+        args = (
+            self.num_points,
+            self.connection_radius,
+            self.game_area,
+            self.obstacles,
+            self.scale_x,
+            self.scale_y,
+            self.offset_x,
+            self.offset_y,
+        )
+        if self.roadmap_variants:
+            # cycle through a fixed set of roadmaps, which the cache can keep
+            self.variant = (self.variant + 1) % self.roadmap_variants
+            seed = self.variant
+        else:
+            # every rebuild gets a fresh but reproducible roadmap
+            seed = int(self.rng.integers(2**32))
+        if self.roadmap_cache is not None and not self.lazy_roadmap:
+            self.roadmap, self.points = self.roadmap_cache.build_roadmap(
+                *args,
+                sampler=self.sampler,
+                seed=seed,
+                extra_edges=self.extra_edges,
+                workers=self.roadmap_workers,
+            )
+        else:
+            self.roadmap, self.points = build_roadmap(
+                *args,
+                sampler=self.sampler,
+                seed=seed,
+                lazy=self.lazy_roadmap,
+                extra_edges=self.extra_edges,
+                workers=self.roadmap_workers,
+            )
+        if self.lazy_roadmap:
+            self.distance_field = None
+        else:
+            self.distance_field = DistanceField(self.roadmap)
+        # all-pairs paths make every query a table walk, if they fit
+        num_nodes = self.roadmap.num_nodes
+        if AllPairsTable.memory_cost(num_nodes) <= self.all_pairs_max_bytes:
+            self.all_pairs = AllPairsTable(self.roadmap)
+        else:
+            self.all_pairs = None
+        if self.cluster_size is not None:
+            self.hierarchy = HierarchicalRoadmap(self.roadmap, self.cluster_size)
+        for enemy in self.enemies:
+            enemy.set_roadmap(self.roadmap, self.points)
+        if self.planner_service is not None:
+            self.planner_service.close()
+            self.planner_service = None
+        if self.planner_workers > 0:
+            self.planner_service = PlannerService(self.roadmap, self.planner_workers)
+
+    def reset_enemies(self):
+        self.enemy_slow.reset(enemy_slow_start_pos)
+        self.enemy_fast.reset(enemy_fast_start_pos)
+        self.enemy_qlearning.reset(enemy_qlearning_start_pos)
+        self.swarm.positions[self.chasers] = self.chaser_starts
+        self.swarm.nodes[self.chasers] = -1
+        self.swarm.targets[self.chasers] = np.nan
+
+    def reset_timer(self):
+        self.timer = self.timer_start
+
+    def reset_round(self):
+        """Start a new round after the player was caught or has won."""
+        self.player.reset()
+        self.reset_enemies()
+        self.enemy_slow.set_params(1, True, None)
+        self.reset_timer()
+
+    def plan_in_background(self, player_position):
+        """
+        Swap in the paths the planner service finished since the last tick
+        and ask for new ones. Enemies keep following their current path
+        until a new one arrives.
+        """
+        for enemy_id, path_indices in self.planner_service.poll().items():
+            self.enemies[enemy_id].next_path = path_indices
+        index = self.roadmap.index
+        goal_idx = index.nearest(player_position)
+        for enemy_id, enemy in enumerate(self.enemies):
+            if enemy.locked_on_path:
+                continue
+            if enemy.next_path:
+                # the enemy has moved on since it asked for the path
+                set_enemy_path(enemy, self.points, enemy.next_path)
+                enemy.next_path = None
+            self.planner_service.request(
+                enemy_id, index.nearest(enemy.position), goal_idx
+            )
+
+    def close(self):
+        """Stop the planner workers, if any."""
+        if self.planner_service is not None:
+            self.planner_service.close()
+            self.planner_service = None
+
+    def step(self, move=(0, 0)):
+        """
+        Advance the game by one tick. move is the player input direction,
+        -1, 0 or 1 on each axis. Returns CAUGHT, WON or None.
+        """
+        self.ticks += 1
+        current_time = self.current_time
+        player = self.player
+
+        player.update(
+            move,
+            self.obstacles,
+            self.hiding_spots,
+            self.scale_x,
+            self.scale_y,
+            self.offset_x,
+            self.offset_y,
+        )
+
+        if current_time - self.last_count >= 1000:
+            self.timer -= 1
+            self.last_count = current_time
+
+        player_pos = player.position
+        if self.planner_service is not None:
+            self.plan_in_background(player_pos)
+        else:
+            for enemy in self.enemies:
+                update_enemy_path(
+                    enemy,
+                    player_pos,
+                    self.roadmap,
+                    self.points,
+                    distance_field=self.distance_field,
+                    all_pairs=self.all_pairs,
+                    hierarchy=self.hierarchy,
+                )
+
+        # speedup at 30 secs
+        if self.timer == 30:
+            self.enemy_slow.set_params(3, True, None)
+
+        # every enemy picks its target, the chasers get theirs from the
+        # distance field, and then one swarm step moves them all; the tick's
+        # neighbor grid serves that step and the capture check
+        agent_grid = self.swarm.agent_grid()
+        for enemy in self.enemies:
+            enemy.steer(current_time, player_pos, lambda: player.is_hiding)
+        if len(self.chasers):
+            if player.is_hiding:
+                # chasers lose sight of the player and wait where they are
+                self.swarm.targets[self.chasers] = np.nan
+            else:
+                self.distance_field.update(self.roadmap.index.nearest(player_pos))
+                self.swarm.plan(self.roadmap, self.distance_field)
+        self.swarm.step(
+            to_screen(
+                self.obstacles,
+                self.scale_x,
+                self.scale_y,
+                self.offset_x,
+                self.offset_y,
+            ),
+            agent_grid=agent_grid,
+        )
+        for enemy in self.enemies:
+            enemy.settle(player_pos)
+            # the enemy sprite is drawn with its top left corner at position
+            enemy.rect.x, enemy.rect.y = enemy.position
+
+        # enemies are 25 x 25 sprites drawn from their top left corner, so
+        # one touches the player when that corner is inside this box
+        rect = player.rect
+        if len(agent_grid.query_box((rect.left - 25, rect.top - 25), rect.bottomright)):
+            return CAUGHT
+        if self.timer <= 0:
+            return WON
+        return None
+
+    def run(self, num_ticks, controller=None):
+        """
+        Run num_ticks ticks without a display, starting a new round whenever
+        one ends. controller(sim) returns the player move for each tick.
+        Returns the number of rounds caught and won.
+        """
+        outcomes = {CAUGHT: 0, WON: 0}
+        for _ in range(num_ticks):
+            move = controller(self) if controller is not None else (0, 0)
+            outcome = self.step(move)
+            if outcome is not None:
+                outcomes[outcome] += 1
+                self.reset_round()
+        return outcomes
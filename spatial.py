@@ -0,0 +1,401 @@
+import numpy as np
+
+
+def _ranges_to_pairs(owners, starts, counts):
+    """
+    Expand per-owner ranges [starts[i], starts[i] + counts[i]) into flat
+    (owner, index) arrays without a Python loop.
+    """
+    total = int(counts.sum())
+    pair_owners = np.repeat(owners, counts)
+    offsets = np.repeat(np.cumsum(counts) - counts, counts)
+    pair_index = np.arange(total) - offsets + np.repeat(starts, counts)
+    return pair_owners, pair_index
+
+
+class ObstacleGrid(object):
+    """
+    Uniform grid broadphase over a fixed set of AABBs, given as an (M, 4)
+    array of x_min, y_min, x_max, y_max rows. Each cell lists the boxes that
+    overlap it in CSR form, so a query only looks at the boxes registered in
+    the cells it touches. Queries return candidate (query, box) pairs, which
+    may repeat a box that spans several cells.
+    """
+
+    def __init__(self, bounds, cell_size=None, max_cells_per_axis=256):
+        self.bounds = np.asarray(bounds, dtype=float).reshape(-1, 4)
+        if len(self.bounds):
+            self.origin = self.bounds[:, :2].min(axis=0)
+            extent = self.bounds[:, 2:].max(axis=0) - self.origin
+        else:
+            self.origin = np.zeros(2)
+            extent = np.ones(2)
+        if cell_size is None:
+            sizes = self.bounds[:, 2:] - self.bounds[:, :2]
+            cell_size = float(np.median(sizes.max(axis=1))) if len(sizes) else 1.0
+        cell_size = max(cell_size, float(extent.max()) / max_cells_per_axis, 1e-9)
+        self.cell_size = cell_size
+        self.shape = np.maximum(np.ceil(extent / cell_size).astype(int), 1)
+
+        ix0, iy0, ix1, iy1 = self._cell_ranges(self.bounds[:, :2], self.bounds[:, 2:])
+        box_ids, cells = self._expand(np.arange(len(self.bounds)), ix0, iy0, ix1, iy1)
+        order = np.argsort(cells, kind="stable")
+        num_cells = int(self.shape[0] * self.shape[1])
+        self.cell_items = box_ids[order]
+        self.cell_start = np.zeros(num_cells + 1, dtype=int)
+        np.cumsum(np.bincount(cells, minlength=num_cells), out=self.cell_start[1:])
+
+    def _cell_ranges(self, lo, hi):
+        """Clamped cell index ranges of boxes; empty where they miss the grid."""
+        lo_cell = np.floor((lo - self.origin) / self.cell_size).astype(int)
+        hi_cell = np.floor((hi - self.origin) / self.cell_size).astype(int)
+        outside = (hi_cell < 0).any(axis=1) | (lo_cell >= self.shape).any(axis=1)
+        lo_cell = np.clip(lo_cell, 0, self.shape - 1)
+        hi_cell = np.clip(hi_cell, 0, self.shape - 1)
+        hi_cell[outside] = lo_cell[outside] - 1
+        return lo_cell[:, 0], lo_cell[:, 1], hi_cell[:, 0], hi_cell[:, 1]
+
+    def _expand(self, owners, ix0, iy0, ix1, iy1):
+        """Flat (owner, cell id) pairs for every cell in each owner's range."""
+        width = np.maximum(ix1 - ix0 + 1, 0)
+        height = np.maximum(iy1 - iy0 + 1, 0)
+        pair_owners, local = _ranges_to_pairs(
+            np.arange(len(owners)), np.zeros(len(owners), dtype=int), width * height
+        )
+        cx = ix0[pair_owners] + local % width[pair_owners]
+        cy = iy0[pair_owners] + local // width[pair_owners]
+        return owners[pair_owners], cy * self.shape[0] + cx
+
+    def _cells_to_items(self, queries, cells):
+        starts = self.cell_start[cells]
+        counts = self.cell_start[cells + 1] - starts
+        pair_queries, positions = _ranges_to_pairs(queries, starts, counts)
+        return pair_queries, self.cell_items[positions]
+
+    def query_boxes(self, lo, hi):
+        """Candidate (query, box) pairs for the N query boxes [lo, hi]."""
+        lo = np.asarray(lo, dtype=float).reshape(-1, 2)
+        hi = np.asarray(hi, dtype=float).reshape(-1, 2)
+        ix0, iy0, ix1, iy1 = self._cell_ranges(lo, hi)
+        queries, cells = self._expand(np.arange(len(lo)), ix0, iy0, ix1, iy1)
+        return self._cells_to_items(queries, cells)
+
+    def query_points(self, points):
+        """Candidate (query, box) pairs for the cells holding the N points."""
+        return self.query_boxes(points, points)
+
+    def query_circles(self, centers, radius):
+        """Candidate (query, box) pairs for circles of the given radius."""
+        centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+        return self.query_boxes(centers - radius, centers + radius)
+
+    def query_segments(self, starts, ends, margin=0.0):
+        """
+        Candidate (query, box) pairs for the N segments thickened by margin.
+        Only cells the thickened segment actually crosses are visited, not
+        every cell of its bounding box.
+        """
+        starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+        ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+        ix0, iy0, ix1, iy1 = self._cell_ranges(
+            np.minimum(starts, ends) - margin, np.maximum(starts, ends) + margin
+        )
+        queries, cells = self._expand(np.arange(len(starts)), ix0, iy0, ix1, iy1)
+
+        cell_lo = (
+            self.origin
+            + np.column_stack((cells % self.shape[0], cells // self.shape[0]))
+            * self.cell_size
+            - margin
+        )
+        cell_hi = cell_lo + self.cell_size + 2 * margin
+        start = starts[queries]
+        delta = ends[queries] - start
+        t_in = np.zeros(len(queries))
+        t_out = np.ones(len(queries))
+        for axis in range(2):
+            d = delta[:, axis]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                t1 = (cell_lo[:, axis] - start[:, axis]) / d
+                t2 = (cell_hi[:, axis] - start[:, axis]) / d
+            inside = (cell_lo[:, axis] <= start[:, axis]) & (
+                start[:, axis] <= cell_hi[:, axis]
+            )
+            parallel = d == 0
+            t_in = np.maximum(
+                t_in, np.where(parallel, np.where(inside, 0, 2), np.minimum(t1, t2))
+            )
+            t_out = np.minimum(
+                t_out, np.where(parallel, np.where(inside, 1, -1), np.maximum(t1, t2))
+            )
+        crossed = t_in <= t_out
+        return self._cells_to_items(queries[crossed], cells[crossed])
+
+
+class PointGrid(object):
+    """
+    Uniform grid index over a fixed set of N x 2 points for nearest-neighbor
+    and radius queries. Points are sorted by cell, so each cell is a
+    contiguous slice of the sorted order.
+    """
+
+    def __init__(self, points, cell_size=None):
+        self.points = np.asarray(points, dtype=float).reshape(-1, 2)
+        n = len(self.points)
+        if n:
+            self.origin = self.points.min(axis=0)
+            extent = self.points.max(axis=0) - self.origin
+        else:
+            self.origin = np.zeros(2)
+            extent = np.zeros(2)
+        if cell_size is None:
+            # about one point per cell
+            area = max(extent[0], 1e-9) * max(extent[1], 1e-9)
+            cell_size = np.sqrt(area / max(n, 1))
+        self.cell_size = max(float(cell_size), float(extent.max()) / 1024, 1e-9)
+        self.shape = np.floor(extent / self.cell_size).astype(int) + 1
+
+        cells = self._cell_ids(self._cells_of(self.points))
+        self.order = np.argsort(cells, kind="stable")
+        num_cells = int(self.shape[0] * self.shape[1])
+        self.cell_start = np.zeros(num_cells + 1, dtype=int)
+        np.cumsum(np.bincount(cells, minlength=num_cells), out=self.cell_start[1:])
+
+    def __len__(self):
+        return len(self.points)
+
+    def _cells_of(self, points):
+        cells = np.floor((points - self.origin) / self.cell_size).astype(int)
+        return np.clip(cells, 0, self.shape - 1)
+
+    def _cell_ids(self, cells):
+        return cells[..., 1] * self.shape[0] + cells[..., 0]
+
+    def _block(self, lo, hi):
+        """Indices of the points in the cells lo..hi (inclusive)."""
+        rows = np.arange(lo[1], hi[1] + 1) * self.shape[0]
+        starts = self.cell_start[rows + lo[0]]
+        ends = self.cell_start[rows + hi[0] + 1]
+        # rows of cells are contiguous in the sorted order
+        return np.concatenate(
+            [self.order[s:e] for s, e in zip(starts, ends)] or [np.zeros(0, int)]
+        )
+
+    def query_radius(self, point, radius):
+        """Indices of the points within radius of point, nearest first."""
+        point = np.asarray(point, dtype=float)
+        lo = self._cells_of(point - radius)
+        hi = self._cells_of(point + radius)
+        candidates = self._block(lo, hi)
+        dist = np.linalg.norm(self.points[candidates] - point, axis=1)
+        inside = dist <= radius
+        candidates, dist = candidates[inside], dist[inside]
+        return candidates[np.argsort(dist, kind="stable")]
+
+    def query_radius_pairs(self, points, radius):
+        """
+        (query, index) pairs of the points within radius of each of N query
+        points, all queries at once.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        lo = self._cells_of(points - radius)
+        hi = self._cells_of(points + radius)
+        # one range of the sorted order per query and row of its block
+        rows = hi[:, 1] - lo[:, 1] + 1
+        owners = np.repeat(np.arange(len(points)), rows)
+        row = np.arange(rows.sum()) - np.repeat(np.cumsum(rows) - rows, rows)
+        row = (row + lo[owners, 1]) * self.shape[0]
+        starts = self.cell_start[row + lo[owners, 0]]
+        ends = self.cell_start[row + hi[owners, 0] + 1]
+        queries, positions = _ranges_to_pairs(owners, starts, ends - starts)
+        candidates = self.order[positions]
+        d = self.points[candidates] - points[queries]
+        close = np.einsum("ij,ij->i", d, d) <= radius * radius
+        return queries[close], candidates[close]
+
+    def query_knn(self, point, k=1):
+        """Indices of the k points nearest to point, nearest first."""
+        point = np.asarray(point, dtype=float)
+        k = min(k, len(self.points))
+        if k <= 0:
+            return np.zeros(0, dtype=int)
+        center = self._cells_of(point)
+        grid_lo = self.origin
+        grid_hi = self.origin + self.shape * self.cell_size
+        ring = 0
+        while True:
+            lo = np.maximum(center - ring, 0)
+            hi = np.minimum(center + ring, self.shape - 1)
+            candidates = self._block(lo, hi)
+            if len(candidates) >= k:
+                dist = np.linalg.norm(self.points[candidates] - point, axis=1)
+                nearest = np.argsort(dist, kind="stable")[:k]
+                # radius guaranteed to be fully searched; sides of the block
+                # at the grid border have no points beyond them
+                block_lo = self.origin + lo * self.cell_size
+                block_hi = self.origin + (hi + 1) * self.cell_size
+                gaps = np.concatenate(
+                    (
+                        np.where(block_lo <= grid_lo, np.inf, point - block_lo),
+                        np.where(block_hi >= grid_hi, np.inf, block_hi - point),
+                    )
+                )
+                if dist[nearest[-1]] <= gaps.min():
+                    return candidates[nearest]
+                ring = max(
+                    ring + 1, int(np.ceil(dist[nearest[-1]] / self.cell_size)) + 1
+                )
+            else:
+                ring += 1
+
+    def nearest(self, point):
+        """Index of the point nearest to point."""
+        return int(self.query_knn(point, 1)[0])
+
+    def query_nearest(self, points):
+        """
+        Index of the nearest grid point for each of N query points, all
+        queries at once: rings of cells around each query are searched
+        outwards until no unsearched cell can hold anything closer.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        best = np.full(len(points), -1, dtype=int)
+        if len(self.points) == 0:
+            return best
+        best_d2 = np.full(len(points), np.inf)
+        centers = self._cells_of(points)
+        pending = np.arange(len(points))
+        grid_lo = self.origin
+        grid_hi = self.origin + self.shape * self.cell_size
+        ring = 0
+        while len(pending):
+            if ring == 0:
+                offsets = np.zeros((1, 2), dtype=int)
+            else:
+                side = np.arange(-ring, ring + 1)
+                offsets = np.concatenate(
+                    (
+                        np.column_stack((side, np.full_like(side, -ring))),
+                        np.column_stack((side, np.full_like(side, ring))),
+                        np.column_stack((np.full(len(side) - 2, -ring), side[1:-1])),
+                        np.column_stack((np.full(len(side) - 2, ring), side[1:-1])),
+                    )
+                )
+            cells = (centers[pending, None, :] + offsets).reshape(-1, 2)
+            owners = np.repeat(pending, len(offsets))
+            inside = (cells >= 0).all(axis=1) & (cells < self.shape).all(axis=1)
+            owners, cells = owners[inside], cells[inside]
+            ids = self._cell_ids(cells)
+            starts = self.cell_start[ids]
+            queries, positions = _ranges_to_pairs(
+                owners, starts, self.cell_start[ids + 1] - starts
+            )
+            # rings can be empty for every query; only queries with
+            # candidates are reduced
+            if len(queries):
+                candidates = self.order[positions]
+                d = self.points[candidates] - points[queries]
+                d2 = np.einsum("ij,ij->i", d, d)
+                # nearest candidate per query: first of each query after sorting
+                order = np.lexsort((d2, queries))
+                queries, candidates, d2 = queries[order], candidates[order], d2[order]
+                first = np.flatnonzero(np.r_[True, queries[1:] != queries[:-1]])
+                queries, candidates, d2 = queries[first], candidates[first], d2[first]
+                closer = d2 < best_d2[queries]
+                best[queries[closer]] = candidates[closer]
+                best_d2[queries[closer]] = d2[closer]
+
+            # distance fully searched so far; sides at the grid border have
+            # no points beyond them
+            block_lo = self.origin + (centers[pending] - ring) * self.cell_size
+            block_hi = self.origin + (centers[pending] + ring + 1) * self.cell_size
+            p = points[pending]
+            gaps = np.concatenate(
+                (
+                    np.where(block_lo <= grid_lo, np.inf, p - block_lo),
+                    np.where(block_hi >= grid_hi, np.inf, block_hi - p),
+                ),
+                axis=1,
+            ).min(axis=1)
+            pending = pending[best_d2[pending] > gaps**2]
+            ring += 1
+        return best
+
+    def query_pairs(self, radius):
+        """
+        All index pairs (i, j) with i < j and points closer than radius, as
+        two arrays sorted by i then j. Cells are paired by offset, each
+        offset in one direction only, so every pair is generated once.
+        """
+        if self.cell_size < radius / 4:
+            # fewer, larger cells make far fewer offsets to loop over
+            return PointGrid(self.points, radius / 2).query_pairs(radius)
+        reach = np.minimum(np.ceil(radius / self.cell_size), self.shape - 1)
+        reach_x, reach_y = int(reach[0]), int(reach[1])
+        cells = self._cells_of(self.points)
+        firsts, seconds = [], []
+        for oy in range(0, reach_y + 1):
+            for ox in range(-reach_x, reach_x + 1):
+                if oy == 0 and ox < 0:
+                    continue
+                other = cells + (ox, oy)
+                valid = (other >= 0).all(axis=1) & (other < self.shape).all(axis=1)
+                owners = np.flatnonzero(valid)
+                other_ids = self._cell_ids(other[owners])
+                starts = self.cell_start[other_ids]
+                counts = self.cell_start[other_ids + 1] - starts
+                i, positions = _ranges_to_pairs(owners, starts, counts)
+                j = self.order[positions]
+                if ox == 0 and oy == 0:
+                    keep = i < j
+                    i, j = i[keep], j[keep]
+                d = self.points[i] - self.points[j]
+                close = np.einsum("ij,ij->i", d, d) < radius * radius
+                i, j = i[close], j[close]
+                firsts.append(np.minimum(i, j))
+                seconds.append(np.maximum(i, j))
+        i = np.concatenate(firsts)
+        j = np.concatenate(seconds)
+        order = np.lexsort((j, i))
+        return i[order], j[order]
+
+
+class AgentGrid(object):
+    """
+    Neighbor index over moving agents, rebuilt once per tick. The grid is
+    built from a snapshot of positions, but queries test the live array, so
+    agents that moved since the build are answered where they are now.
+    slack is the farthest an agent can move within the tick; the grid is
+    searched that much further to still find them.
+    """
+
+    def __init__(self, positions, slack=0.0, cell_size=None):
+        self.positions = positions
+        self.slack = float(slack)
+        self.grid = PointGrid(np.array(positions), cell_size)
+
+    def __len__(self):
+        return len(self.grid)
+
+    def query_radius(self, point, radius):
+        """Indices of the agents within radius of point."""
+        return np.sort(self.query_radius_pairs(point, radius)[1])
+
+    def query_radius_pairs(self, points, radius):
+        """(query, agent) pairs of the agents within radius of N points."""
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        queries, candidates = self.grid.query_radius_pairs(points, radius + self.slack)
+        d = self.positions[candidates] - points[queries]
+        close = np.einsum("ij,ij->i", d, d) <= radius * radius
+        return queries[close], candidates[close]
+
+    def query_box(self, lo, hi):
+        """Indices of the agents strictly inside the box lo..hi."""
+        lo = np.asarray(lo, dtype=float)
+        hi = np.asarray(hi, dtype=float)
+        candidates = self.grid.query_radius(
+            (lo + hi) / 2, np.linalg.norm(hi - lo) / 2 + self.slack
+        )
+        inside = self.positions[candidates]
+        inside = ((lo < inside) & (inside < hi)).all(axis=1)
+        return np.sort(candidates[inside])
@@ -0,0 +1,155 @@
+import numpy as np
+from spatial import AgentGrid
+
+# who picks a member's target: the swarm's own vectorized chase planner, or
+# the Enemy object it belongs to (Enemy.steer)
+CHASE = 0
+EXTERNAL = 1
+
+
+class EnemySwarm:
+    """
+    Struct-of-arrays enemy population. Positions, speeds, modes, path
+    cursors (the roadmap node each chaser is heading for) and targets live
+    in contiguous arrays. plan() sets the targets of every CHASE member at
+    once and each Enemy sets its own, and step() then moves all members,
+    lands them on their targets and resolves collisions in one vectorized
+    pass. An Enemy is a view into one row, so the game's hand-written
+    enemies and thousands of plain chasers share one set of arrays.
+    """
+
+    def __init__(self, capacity=16, radius=5):
+        self.radius = radius
+        self.count = 0
+        self.positions = np.zeros((capacity, 2))
+        self.speeds = np.zeros(capacity)
+        self.modes = np.zeros(capacity, dtype=np.int8)
+        self.nodes = np.full(capacity, -1, dtype=np.int64)
+        # where each member heads this tick, NaN for nowhere, and whether
+        # the last step refused its move
+        self.targets = np.full((capacity, 2), np.nan)
+        self.blocked = np.zeros(capacity, dtype=bool)
+        self.points = np.zeros((0, 2))
+        self._roadmap = None
+        self._field = None
+        self._field_goal = None
+        self._next_hop = None
+
+    def __len__(self):
+        return self.count
+
+    def add(self, position, speed=2, mode=CHASE):
+        """Add a member and return its index."""
+        if self.count == len(self.positions):
+            self._grow(max(2 * self.count, 16))
+        i = self.count
+        self.positions[i] = position
+        self.speeds[i] = speed
+        self.modes[i] = mode
+        self.nodes[i] = -1
+        self.targets[i] = np.nan
+        self.blocked[i] = False
+        self.count += 1
+        return i
+
+    def _grow(self, capacity):
+        for name in ("positions", "speeds", "modes", "nodes", "targets", "blocked"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[: self.count] = old[: self.count]
+            setattr(self, name, new)
+
+    def members(self, mode=CHASE):
+        return np.flatnonzero(self.modes[: self.count] == mode)
+
+    def plan(self, roadmap, distance_field):
+        """
+        Target every chaser at its next roadmap node towards the goal of
+        distance_field. A chaser keeps its node until it gets there and then
+        takes the next hop; chasers without a node, or on a new roadmap,
+        head for their nearest one first.
+        """
+        chasers = self.members(CHASE)
+        if roadmap is not self._roadmap:
+            self._roadmap = roadmap
+            self.points = roadmap.points
+            self.nodes[: self.count] = -1
+        if len(chasers) == 0 or distance_field.goal is None:
+            return
+        if distance_field is not self._field or distance_field.goal != self._field_goal:
+            self._field = distance_field
+            self._field_goal = distance_field.goal
+            self._next_hop = np.asarray(distance_field.next_hop, dtype=np.int64)
+
+        nodes = self.nodes[chasers]
+        lost = nodes < 0
+        if lost.any():
+            nodes[lost] = roadmap.index.query_nearest(self.positions[chasers[lost]])
+        arrived = (self.positions[chasers] == self.points[nodes]).all(axis=1)
+        hop = self._next_hop[nodes]
+        nodes = np.where(arrived & (hop >= 0), hop, nodes)
+        self.nodes[chasers] = nodes
+        self.targets[chasers] = self.points[nodes]
+
+    def step(self, obstacles, members=None, agent_grid=None):
+        """
+        Move every member with a target (or only those in members) up to
+        its speed towards it; members within one step land exactly on it.
+        Moves that would hit an obstacle (screen-space ObstacleSet), or
+        close in on a member ahead that is two radii away or less, are not
+        taken, and blocked records them for the members to respond to.
+        Neighbors are looked up in agent_grid, the tick's AgentGrid, which
+        is built here when not given.
+        """
+        if members is None:
+            members = np.arange(self.count)
+        self.blocked[members] = False
+        movers = members[~np.isnan(self.targets[members, 0])]
+        if len(movers) == 0:
+            return
+        starts = self.positions[movers]
+        targets = self.targets[movers]
+        delta = targets - starts
+        dist = np.linalg.norm(delta, axis=1)
+        speeds = self.speeds[movers]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ends = starts + delta * (speeds / dist)[:, None]
+        ends[dist <= speeds] = targets[dist <= speeds]
+
+        blocked = obstacles.sweep_circles(starts, ends, self.radius) <= 1
+        if agent_grid is None:
+            agent_grid = self.agent_grid()
+        blocked |= self._crowded(movers, starts, ends, targets, agent_grid)
+        self.blocked[movers[blocked]] = True
+        moved = movers[~blocked]
+        self.positions[moved] = ends[~blocked]
+
+    def _crowded(self, movers, starts, ends, targets, agent_grid):
+        """
+        Which movers would close in on a member two radii away or less
+        that is nearer their target than they are. Moving apart is always
+        allowed, so members that start on top of each other can separate,
+        and of two members meeting at a node the one behind waits.
+        """
+        current = self.positions[: self.count]
+        # pairs of a mover's end position and a member's current position
+        second, first = agent_grid.query_radius_pairs(ends, 2 * self.radius)
+        others = first != movers[second]
+        first, second = first[others], second[others]
+        other = current[first]
+        before = np.linalg.norm(starts[second] - other, axis=1)
+        after = np.linalg.norm(ends[second] - other, axis=1)
+        to_target = np.linalg.norm(targets[second] - starts[second], axis=1)
+        ahead = np.linalg.norm(targets[second] - other, axis=1) < to_target
+        crowded = np.zeros(len(movers), dtype=bool)
+        crowded[second[(after < before) & ahead]] = True
+        return crowded
+
+    def agent_grid(self):
+        """
+        AgentGrid over every member for the coming tick, in which members
+        move at most their speed.
+        """
+        speeds = self.speeds[: self.count]
+        slack = speeds.max() if self.count else 0.0
+        return AgentGrid(self.positions[: self.count], slack)
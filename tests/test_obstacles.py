@@ -0,0 +1,100 @@
+import numpy as np
+from obstacles import BoxObstacle, ObstacleSet
+
+# positions along each move the brute force checks
+STEPS = np.linspace(0, 1, 401)
+
+
+def random_obstacles(seed=0, count=40, cell_size=None):
+    rng = np.random.default_rng(seed)
+    lo = rng.random((count, 2)) * 900
+    hi = lo + 10 + rng.random((count, 2)) * 60
+    return ObstacleSet(
+        (
+            BoxObstacle([(a[0], a[1]), (b[0], a[1]), (b[0], b[1]), (a[0], b[1])])
+            for a, b in zip(lo, hi)
+        ),
+        cell_size,
+    )
+
+
+def random_moves(seed=1, count=200):
+    rng = np.random.default_rng(seed)
+    starts = rng.random((count, 2)) * 1000
+    ends = starts + rng.normal(0, 80, (count, 2))
+    # a few moves that stay put
+    ends[:10] = starts[:10]
+    return starts, ends
+
+
+def test_sweeps_match_testing_every_box():
+    # a single grid cell makes every query test every box
+    obstacles = random_obstacles()
+    everything = random_obstacles(cell_size=1e6)
+    starts, ends = random_moves()
+    assert np.array_equal(
+        obstacles.sweep_boxes(starts, ends, (25, 15)),
+        everything.sweep_boxes(starts, ends, (25, 15)),
+    )
+    assert np.array_equal(
+        obstacles.sweep_circles(starts, ends, 8.0),
+        everything.sweep_circles(starts, ends, 8.0),
+    )
+
+
+def positions_along(starts, ends):
+    return starts[:, None] + STEPS[None, :, None] * (ends - starts)[:, None]
+
+
+def test_sweep_boxes_matches_brute_force():
+    obstacles = random_obstacles()
+    starts, ends = random_moves()
+    size = (25, 15)
+    hits = obstacles.sweep_boxes(starts, ends, size)
+
+    half = np.array(size) / 2
+    inflated = obstacles.bounds + np.concatenate((-half, half))
+    along = positions_along(starts, ends)[:, :, None]
+    inside = (
+        (inflated[:, 0] <= along[..., 0])
+        & (along[..., 0] <= inflated[:, 2])
+        & (inflated[:, 1] <= along[..., 1])
+        & (along[..., 1] <= inflated[:, 3])
+    )
+    sampled = inside.any(axis=(1, 2))
+    # a hit the samples see is found, and the samples miss little else
+    assert not (sampled & ~hits).any()
+    assert (hits & ~sampled).sum() <= 3
+    assert sampled.sum() > 20
+
+
+def distance_to_boxes(points, bounds):
+    closest = np.clip(points[..., None, :], bounds[:, :2], bounds[:, 2:])
+    return np.linalg.norm(points[..., None, :] - closest, axis=-1).min(axis=-1)
+
+
+def test_sweep_circles_matches_brute_force():
+    obstacles = random_obstacles()
+    starts, ends = random_moves()
+    radius = 8.0
+    times = obstacles.sweep_circles(starts, ends, radius)
+
+    gaps = distance_to_boxes(positions_along(starts, ends), obstacles.bounds)
+    touching = gaps < radius
+    sampled = np.where(touching.any(axis=1), STEPS[touching.argmax(axis=1)], np.inf)
+    # the first contact is no later than the first sample that touches
+    assert (times <= sampled).all()
+    assert (np.isinf(times) == np.isinf(sampled)).sum() >= len(times) - 3
+    assert np.isfinite(times).sum() > 20
+
+    # and the circle just touches a box there, clear of all of them before
+    hit = np.isfinite(times)
+    starts, ends, times = starts[hit], ends[hit], times[hit]
+    at = starts + times[:, None] * (ends - starts)
+    gap = distance_to_boxes(at, obstacles.bounds)
+    assert np.allclose(gap[times > 0], radius)
+    assert (gap[times == 0] <= radius + 1e-9).all()
+    step = 1 / (len(STEPS) - 1)
+    before = starts + np.maximum(times - step, 0)[:, None] * (ends - starts)
+    clear = distance_to_boxes(before, obstacles.bounds)
+    assert (clear[times > step] >= radius - 1e-9).all()
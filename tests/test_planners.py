@@ -0,0 +1,137 @@
+import heapq
+import math
+import numpy as np
+from roadmap import Roadmap
+from spatial import PointGrid
+from utils import DistanceField, IncrementalPlanner, AnytimePlanner
+from all_pairs import AllPairsTable
+from hierarchical import HierarchicalRoadmap
+
+
+def random_roadmap(seed=0, num_points=150, radius=120):
+    """Both directions of every edge between points less than radius apart."""
+    rng = np.random.default_rng(seed)
+    points = rng.random((num_points, 2)) * 1000
+    first, second = PointGrid(points).query_pairs(radius)
+    sources = np.concatenate((first, second))
+    targets = np.concatenate((second, first))
+    return Roadmap.from_edges(points, sources, targets)
+
+
+def dijkstra(roadmap, source, blocked=()):
+    """Shortest distances from source, skipping the directed edges blocked."""
+    dist = [math.inf] * roadmap.num_nodes
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for v, weight in zip(roadmap.neighbors(u), roadmap.neighbor_weights(u)):
+            if (u, int(v)) in blocked:
+                continue
+            if d + weight < dist[v]:
+                dist[v] = d + weight
+                heapq.heappush(heap, (d + weight, int(v)))
+    return dist
+
+
+def path_cost(roadmap, path, blocked=()):
+    """Length of a path of node indices, which must follow the edges."""
+    cost = 0.0
+    for u, v in zip(path, path[1:]):
+        assert (u, v) not in blocked
+        neighbors = roadmap.neighbors(u).tolist()
+        assert v in neighbors
+        cost += roadmap.neighbor_weights(u)[neighbors.index(v)]
+    return cost
+
+
+def queries(roadmap, count=20, seed=1):
+    rng = np.random.default_rng(seed)
+    return rng.integers(roadmap.num_nodes, size=(count, 2)).tolist()
+
+
+def test_distance_field_matches_dijkstra():
+    roadmap = random_roadmap()
+    field = DistanceField(roadmap)
+    for start, goal in queries(roadmap):
+        field.update(goal)
+        expected = dijkstra(roadmap, start)[goal]
+        path = field.path_from(start)
+        if expected == math.inf:
+            assert path == []
+        else:
+            assert path[0] == start and path[-1] == goal
+            assert math.isclose(path_cost(roadmap, path), expected)
+
+
+def test_incremental_planner_is_optimal_again_after_an_edge_is_blocked():
+    roadmap = random_roadmap()
+    checked = 0
+    for start, goal in queries(roadmap):
+        expected = dijkstra(roadmap, start)[goal]
+        if expected == math.inf or start == goal:
+            continue
+        planner = IncrementalPlanner(roadmap)
+        path = planner.plan(start, goal)
+        assert math.isclose(path_cost(roadmap, path), expected)
+
+        blocked = {(path[0], path[1])}
+        planner.set_edge_cost(path[0], path[1], math.inf)
+        expected = dijkstra(roadmap, start, blocked)[goal]
+        path = planner.plan(start, goal)
+        if expected == math.inf:
+            assert path == []
+        else:
+            assert path[0] == start and path[-1] == goal
+            assert math.isclose(path_cost(roadmap, path, blocked), expected)
+        checked += 1
+    assert checked > 0
+
+
+def test_anytime_planner_ends_with_the_optimal_cost():
+    roadmap = random_roadmap()
+    for start, goal in queries(roadmap):
+        expected = dijkstra(roadmap, start)[goal]
+        planner = AnytimePlanner(roadmap)
+        path = planner.plan(start, goal, budget_us=50)
+        while not planner.done:
+            if path:
+                # each pass is within its epsilon of the shortest path
+                assert path_cost(roadmap, path) <= planner.epsilon * expected + 1e-6
+            path = planner.plan(start, goal, budget_us=50)
+        if expected == math.inf:
+            assert path == []
+        else:
+            assert path[0] == start and path[-1] == goal
+            assert math.isclose(path_cost(roadmap, path), expected)
+
+
+def test_all_pairs_table_matches_dijkstra():
+    roadmap = random_roadmap()
+    table = AllPairsTable(roadmap, processes=1)
+    for source in range(0, roadmap.num_nodes, 7):
+        dist = dijkstra(roadmap, source)
+        for goal in range(roadmap.num_nodes):
+            path = table.path(source, goal)
+            if dist[goal] == math.inf:
+                assert path == []
+                continue
+            assert np.isclose(table.distance[source, goal], dist[goal], rtol=1e-5)
+            assert path[0] == source and path[-1] == goal
+            assert math.isclose(path_cost(roadmap, path), dist[goal], rel_tol=1e-9)
+
+
+def test_hierarchical_paths_follow_the_roadmap():
+    roadmap = random_roadmap()
+    hierarchy = HierarchicalRoadmap(roadmap, cluster_size=250)
+    assert hierarchy.num_clusters > 1
+    for start, goal in queries(roadmap, count=50):
+        expected = dijkstra(roadmap, start)[goal]
+        path = hierarchy.path(start, goal)
+        if expected == math.inf:
+            assert path == []
+        else:
+            assert path[0] == start and path[-1] == goal
+            assert path_cost(roadmap, path) >= expected - 1e-9
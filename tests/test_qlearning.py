@@ -0,0 +1,64 @@
+import numpy as np
+from qlearning import (
+    DenseQTable,
+    SparseQTable,
+    ReplayBuffer,
+    update_batch,
+    save_q_table,
+    load_q_table,
+)
+
+
+def test_sparse_table_learns_the_same_values_as_dense():
+    rng = np.random.default_rng(0)
+    dense = DenseQTable((30, 20))
+    sparse = SparseQTable((30, 20), capacity=4)
+    for _ in range(200):
+        states = rng.integers((30, 20), size=(16, 2))
+        actions = rng.integers(8, size=16)
+        rewards = rng.normal(size=16).astype(np.float32)
+        next_states = rng.integers((30, 20), size=(16, 2))
+        for table in (dense, sparse):
+            update_batch(table, states, actions, rewards, next_states, 0.1, 0.95)
+    assert np.array_equal(sparse.to_dense().values, dense.values)
+    assert sparse.num_states == dense.num_states
+
+    for state in rng.integers((30, 20), size=(50, 2)).tolist():
+        x, y = state
+        assert np.array_equal(sparse[x, y], dense[x, y])
+        assert sparse[x, y, 3] == dense[x, y, 3]
+    sparse[29, 19, 2] = dense[29, 19, 2] = 5.0
+    states = np.array([[29, 19], [0, 0], [29, 19]])
+    assert np.array_equal(sparse.rows_of(states), dense.rows_of(states))
+
+
+def test_replay_buffer_keeps_the_latest_transitions():
+    buffer = ReplayBuffer(capacity=5)
+    for i in range(8):
+        buffer.add((i, -i), i % 8, float(i), (i + 1, -i - 1))
+    assert len(buffer) == 5
+    assert buffer.position == 3
+    assert sorted(buffer.states[:, 0].tolist()) == [3, 4, 5, 6, 7]
+
+    np.random.seed(0)
+    states, actions, rewards, next_states = buffer.sample(100)
+    assert len(states) == 100
+    assert set(states[:, 0].tolist()) <= {3, 4, 5, 6, 7}
+    # the parts of each transition stay together
+    assert np.array_equal(states[:, 1], -states[:, 0])
+    assert np.array_equal(actions, states[:, 0])
+    assert np.array_equal(rewards, states[:, 0])
+    assert np.array_equal(next_states[:, 0], states[:, 0] + 1)
+
+
+def test_saved_table_loads_back(tmp_path):
+    path = str(tmp_path / "qtable.npy")
+    sparse = SparseQTable((10, 10))
+    sparse[3, 4, 5] = 2.5
+    save_q_table(path, sparse)
+    table = load_q_table(path)
+    assert table[3, 4, 5] == 2.5
+    assert table.values.sum() == 2.5
+    # copy-on-write: changes stay out of the file
+    table[3, 4, 5] = 1.0
+    assert load_q_table(path)[3, 4, 5] == 2.5
@@ -0,0 +1,84 @@
+import os
+import numpy as np
+from obstacles import load_obstacles, to_screen
+from parallel_roadmap import validate_edges_parallel
+from roadmap import Roadmap
+from roadmap_cache import RoadmapCache
+from simulation import map_scaling
+from utils import build_roadmap, validate_edges
+
+MAZE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "maze.csv")
+
+
+def square():
+    points = np.array([[0, 0], [10, 0], [10, 10], [0, 10.0]])
+    sources = [0, 1, 1, 2, 2, 3, 3, 0]
+    targets = [1, 0, 2, 1, 3, 2, 0, 3]
+    return Roadmap.from_edges(points, sources, targets)
+
+
+def test_load_maps_the_saved_arrays_without_copying(tmp_path):
+    roadmap = square()
+    roadmap.save(str(tmp_path))
+    loaded = Roadmap.load(str(tmp_path))
+    # the points are a view of the mapped file, not a copy in memory
+    base = loaded.points
+    while not isinstance(base, np.memmap) and base is not None:
+        base = base.base
+    assert base is not None
+    assert np.array_equal(loaded.points, roadmap.points)
+    assert loaded.to_dict() == roadmap.to_dict()
+
+
+def maze_args(num_points=150):
+    obstacles = load_obstacles(MAZE)
+    return (num_points, 200, (1000, 1000), obstacles) + map_scaling(
+        obstacles, 1000, 1000
+    )
+
+
+def assert_same_roadmap(a, b):
+    for name in ("points", "indptr", "indices", "weights"):
+        assert np.array_equal(getattr(a, name), getattr(b, name)), name
+
+
+def test_parallel_build_gives_the_serial_roadmap():
+    serial, _ = build_roadmap(*maze_args(), seed=3)
+    parallel, _ = build_roadmap(*maze_args(), seed=3, workers=2)
+    assert serial.num_edges > 0
+    assert_same_roadmap(serial, parallel)
+
+
+def test_parallel_edge_checks_match_serial_ones():
+    _, _, _, obstacles, *scaling = maze_args()
+    rng = np.random.default_rng(0)
+    points = rng.random((300, 2)) * 1000
+    first = rng.integers(300, size=5000)
+    second = rng.integers(300, size=5000)
+    serial = validate_edges(points[first], points[second], obstacles, *scaling)
+    parallel = validate_edges_parallel(
+        points, first, second, to_screen(obstacles, *scaling), 3, chunk_size=700
+    )
+    assert 0 < serial.sum() < len(serial)
+    assert np.array_equal(parallel, serial)
+
+
+def test_cache_round_trip(tmp_path):
+    directory = str(tmp_path / "cache")
+    cache = RoadmapCache(directory)
+    built, _ = cache.build_roadmap(*maze_args(), seed=3)
+    assert (cache.hits, cache.misses) == (0, 1)
+    expected, _ = build_roadmap(*maze_args(), seed=3)
+    assert_same_roadmap(built, expected)
+
+    # a new cache reads the same roadmap back from disk
+    cache = RoadmapCache(directory)
+    loaded, points = cache.build_roadmap(*maze_args(), seed=3)
+    assert (cache.hits, cache.misses) == (1, 0)
+    assert_same_roadmap(loaded, expected)
+    assert np.array_equal(points, expected.points)
+
+    # other parameters are a miss
+    other, _ = cache.build_roadmap(*maze_args(), seed=4)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert not np.array_equal(other.points, expected.points)
@@ -0,0 +1,132 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pytest
+from obstacles import load_obstacles
+from qlearning import DenseQTable, save_q_table
+from simulation import Simulation, scripted_controller, CAUGHT
+
+MAZE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "maze.csv")
+
+
+def chase(sim, num_ticks=900):
+    """
+    The player walks left for 40 ticks and then stands still in the open.
+    Returns the tick the player was caught at (None if never) and the
+    distance from the player to the nearest enemy on every tick.
+    """
+    controller = scripted_controller([(-1, 0)] * 40)
+    gaps = []
+    for tick in range(num_ticks):
+        outcome = sim.step(controller(sim))
+        gaps.append(
+            min(
+                np.linalg.norm(enemy.position - sim.player.position)
+                for enemy in sim.enemies
+            )
+        )
+        if outcome == CAUGHT:
+            return tick, gaps
+    return None, gaps
+
+
+def use_incremental_planner(sim):
+    for enemy in sim.enemies:
+        enemy.use_incremental_planner = True
+
+
+def use_anytime_planner(sim):
+    for enemy in sim.enemies:
+        enemy.planning_budget_us = 2000
+
+
+@pytest.mark.parametrize(
+    "options, setup",
+    [
+        ({}, None),
+        ({}, use_incremental_planner),
+        ({"all_pairs_max_bytes": 2**26}, None),
+        ({}, use_anytime_planner),
+        ({"cluster_size": 250}, None),
+    ],
+    ids=["distance_field", "incremental", "all_pairs", "anytime", "hierarchical"],
+)
+def test_enemies_chase_visible_player(options, setup):
+    sim = Simulation(load_obstacles(MAZE), seed=0, **options)
+    if "all_pairs_max_bytes" in options:
+        assert sim.all_pairs is not None
+    if "cluster_size" in options:
+        assert sim.hierarchy is not None
+    if setup is not None:
+        setup(sim)
+    start = [enemy.position.copy() for enemy in sim.enemies]
+    caught, gaps = chase(sim)
+    assert caught is not None
+    assert gaps[-1] < gaps[0]
+    assert any(
+        not np.array_equal(enemy.position, position)
+        for enemy, position in zip(sim.enemies, start)
+    )
+
+
+def test_lazy_roadmap_checks_only_the_edges_searches_reach():
+    sim = Simulation(load_obstacles(MAZE), seed=0, lazy_roadmap=True)
+    assert sim.distance_field is None
+    sim.step()
+    assert np.mean(sim.roadmap.edge_state != 0) < 0.5
+    caught, gaps = chase(sim)
+    assert caught is not None
+    assert gaps[-1] < gaps[0]
+
+
+def test_chasers_wait_while_player_hides():
+    sim = Simulation(load_obstacles(MAZE), seed=0, num_chasers=30)
+    starts = sim.swarm.positions[sim.chasers].copy()
+    try:
+        for _ in range(300):
+            outcome = sim.step()
+            assert sim.player.is_hiding
+            assert outcome != CAUGHT
+    finally:
+        sim.close()
+    assert np.array_equal(sim.swarm.positions[sim.chasers], starts)
+
+
+def test_q_table_steers_the_q_learning_enemy():
+    positions = []
+    for preferred in (None, 4):
+        sim = Simulation(load_obstacles(MAZE), seed=0)
+        enemy = sim.enemy_qlearning
+        enemy.epsilon = 0.0
+        enemy.q_steering = True
+        enemy.q_cell_size = 10
+        enemy.q_table = DenseQTable((100, 100))
+        if preferred is not None:
+            enemy.q_table.values[..., preferred] = 1.0
+        controller = scripted_controller([(-1, 0)] * 40)
+        try:
+            for _ in range(20):
+                sim.step(controller(sim))
+        finally:
+            sim.close()
+        positions.append(enemy.position.copy())
+    assert not np.array_equal(positions[0], positions[1])
+
+
+def test_q_learning_enemy_follows_its_path_without_a_trained_table(tmp_path):
+    sim = Simulation(load_obstacles(MAZE), seed=0)
+    enemy = sim.enemy_qlearning
+    try:
+        sim.step((0, 0))
+        enemy.path = [enemy.position + (50, 0)]
+        enemy.steer(0, sim.player.position, lambda: False)
+        assert np.array_equal(enemy.swarm.targets[enemy.swarm_index], enemy.path[0])
+
+        path = str(tmp_path / "qtable.npy")
+        save_q_table(path, DenseQTable((100, 100)))
+        enemy.load_trained_q_table(path)
+        assert enemy.q_steering and enemy.epsilon == 0
+    finally:
+        sim.close()
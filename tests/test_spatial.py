@@ -0,0 +1,91 @@
+import numpy as np
+from spatial import PointGrid, AgentGrid
+
+
+def brute_nearest(points, queries):
+    d = np.linalg.norm(queries[:, None, :] - points[None, :, :], axis=2)
+    return d.min(axis=1), d
+
+
+def layouts():
+    rng = np.random.default_rng(0)
+    yield "corners", np.array([[0, 0], [100, 0], [0, 100], [100, 100.0]])
+    yield "two far clusters", np.concatenate(
+        (rng.random((10, 2)) * 5, 1000 + rng.random((10, 2)) * 5)
+    )
+    yield "line", np.column_stack((np.linspace(0, 1000, 50), np.zeros(50)))
+    yield "uniform", rng.random((300, 2)) * 1000
+
+
+def test_query_nearest_matches_brute_force():
+    rng = np.random.default_rng(1)
+    for name, points in layouts():
+        grid = PointGrid(points)
+        lo, hi = points.min(axis=0) - 50, points.max(axis=0) + 50
+        queries = np.concatenate(
+            (
+                [(lo + hi) / 2],
+                rng.uniform(lo, hi, (500, 2)),
+            )
+        )
+        expected, d = brute_nearest(points, queries)
+        found = grid.query_nearest(queries)
+        got = d[np.arange(len(queries)), found]
+        assert np.allclose(got, expected), name
+
+
+def test_query_nearest_of_corner_points_from_the_middle():
+    points = np.array([[0, 0], [100, 0], [0, 100], [100, 100.0]])
+    found = PointGrid(points).query_nearest([[50, 50], [49, 50], [10, 90]])
+    assert found[1] in (0, 2)
+    assert found[2] == 2
+
+
+def test_query_knn_matches_brute_force():
+    rng = np.random.default_rng(2)
+    for name, points in layouts():
+        grid = PointGrid(points)
+        lo, hi = points.min(axis=0) - 50, points.max(axis=0) + 50
+        for query in rng.uniform(lo, hi, (100, 2)):
+            for k in (1, 3, len(points)):
+                dist = np.linalg.norm(points - query, axis=1)
+                got = dist[grid.query_knn(query, k)]
+                assert np.allclose(got, np.sort(dist)[:k]), name
+
+
+def test_query_radius_and_pairs_match_brute_force():
+    for name, points in layouts():
+        grid = PointGrid(points)
+        for radius in (1.0, 30.0, 150.0):
+            query = points.mean(axis=0)
+            dist = np.linalg.norm(points - query, axis=1)
+            assert set(grid.query_radius(query, radius).tolist()) == set(
+                np.flatnonzero(dist <= radius).tolist()
+            ), name
+            d = np.linalg.norm(points[:, None] - points[None], axis=2)
+            i, j = np.nonzero(np.triu(d < radius, 1))
+            first, second = grid.query_pairs(radius)
+            assert np.array_equal(first, i) and np.array_equal(second, j), name
+
+
+def test_agent_grid_answers_for_agents_that_moved():
+    positions = np.array([[0, 0], [50, 50], [100, 0.0]])
+    grid = AgentGrid(positions, slack=10)
+    positions[1] += (8, -6)
+    assert grid.query_radius((58, 44), 1).tolist() == [1]
+    assert grid.query_box((55, 35), (65, 45)).tolist() == [1]
+
+
+def test_query_radius_pairs_matches_brute_force():
+    rng = np.random.default_rng(3)
+    for name, points in layouts():
+        grid = PointGrid(points)
+        lo, hi = points.min(axis=0) - 50, points.max(axis=0) + 50
+        queries = rng.uniform(lo, hi, (50, 2))
+        for radius in (1.0, 30.0, 2000.0):
+            d = np.linalg.norm(queries[:, None] - points[None], axis=2)
+            expected = set(zip(*np.nonzero(d <= radius)))
+            got = set(zip(*grid.query_radius_pairs(queries, radius)))
+            assert {(int(q), int(c)) for q, c in got} == {
+                (int(q), int(c)) for q, c in expected
+            }, name
@@ -0,0 +1,88 @@
+import random
+import numpy as np
+import pytest
+from utils import PriorityQueue, spanning_forest
+
+
+def test_priority_queue_pops_in_order_after_updates_and_removals():
+    rng = random.Random(0)
+    for order in (min, max):
+        queue = PriorityQueue(order)
+        expected = {}
+        for _ in range(2000):
+            item = rng.randrange(100)
+            if rng.random() < 0.2 and item in expected:
+                queue.remove(item)
+                del expected[item]
+            else:
+                value = rng.random()
+                queue.put(item, value)
+                expected[item] = value
+        assert len(queue) == len(expected)
+        best = order(expected.values())
+        assert queue.get(queue.peek()) == best
+        popped = []
+        while not queue.empty():
+            popped.append(expected[queue.pop()])
+        assert popped == sorted(expected.values(), reverse=order is max)
+
+
+def test_priority_queue_errors():
+    queue = PriorityQueue()
+    with pytest.raises(IndexError):
+        queue.pop()
+    with pytest.raises(IndexError):
+        queue.peek()
+    with pytest.raises(KeyError):
+        del queue[0]
+    with pytest.raises(KeyError):
+        PriorityQueue(order="median")
+
+
+def components(num_nodes, first, second):
+    labels = list(range(num_nodes))
+    for a, b in zip(first, second):
+        old, new = labels[a], labels[b]
+        labels = [new if label == old else label for label in labels]
+    return len(set(labels))
+
+
+def test_spanning_forest_is_a_minimum_spanning_forest():
+    rng = np.random.default_rng(0)
+    num_nodes = 40
+    first = rng.integers(num_nodes, size=120)
+    second = rng.integers(num_nodes, size=120)
+    lengths = rng.random(120)
+    keep = spanning_forest(num_nodes, first, second, lengths)
+
+    # no loops, and the same components as the full graph
+    forest = components(num_nodes, first[keep], second[keep])
+    assert forest == components(num_nodes, first, second)
+    assert keep.sum() == num_nodes - forest
+
+    # brute force: no edge left out is shorter than the longest kept edge
+    # on the forest path between its ends
+    kept = [(a, b, w) for a, b, w in zip(first[keep], second[keep], lengths[keep])]
+    for a, b, w in zip(first[~keep], second[~keep], lengths[~keep]):
+        stack, seen = [(a, 0.0)], {a}
+        while stack:
+            node, longest = stack.pop()
+            if node == b:
+                assert w >= longest
+                break
+            for u, v, length in kept:
+                for x, y in ((u, v), (v, u)):
+                    if x == node and y not in seen:
+                        seen.add(y)
+                        stack.append((y, max(longest, length)))
+
+
+def test_spanning_forest_keeps_the_shortest_extra_edges():
+    # a square with both diagonals, the shortest edges first in the forest
+    first = [0, 1, 2, 3, 0, 1]
+    second = [1, 2, 3, 0, 2, 3]
+    lengths = [1.0, 1.0, 1.0, 1.5, 3.0, 2.0]
+    keep = spanning_forest(4, first, second, lengths)
+    assert keep.tolist() == [True, True, True, False, False, False]
+    keep = spanning_forest(4, first, second, lengths, extra_edges=1)
+    assert keep.tolist() == [True, True, True, True, False, False]
@@ -0,0 +1,189 @@
+"""
+Offline training for the Q-learning enemy. Episodes run in the headless
+Simulation on a pool of worker processes; after every round the workers'
+Q-value changes are averaged into the shared table, which is saved as a
+.npy file the game memory-maps at startup.
+
+Run from the repository root: python train_qlearning.py --episodes 200
+"""
+
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from obstacles import load_obstacles
+from qlearning import DenseQTable, save_q_table
+from simulation import Simulation, CAUGHT
+
+MAZE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "maze.csv")
+GAME_AREA = (1000, 1000)
+
+# simulation of the worker process, set by _init_worker
+_sim = None
+
+
+def _init_worker(seed, cell_size):
+    global _sim
+    _sim = Simulation(load_obstacles(MAZE), seed=seed)
+    _sim.enemy_qlearning.q_cell_size = cell_size
+    # the table being trained steers, exploring with the enemy's epsilon
+    _sim.enemy_qlearning.q_steering = True
+
+
+def random_walk(rng, hold=30):
+    """Player controller that picks a new random direction every hold ticks."""
+    move = [(0, 0)]
+
+    def controller(sim):
+        if sim.ticks % hold == 0:
+            move[0] = tuple(int(d) for d in rng.integers(-1, 2, size=2))
+        return move[0]
+
+    return controller
+
+
+def run_episodes(values, num_episodes, max_ticks, seed):
+    """
+    Play num_episodes rounds starting from the Q-values in values. Returns
+    the change to the values, the return of each episode and how many
+    rounds ended with the player caught.
+    """
+    sim = _sim
+    enemy = sim.enemy_qlearning
+    enemy.q_table = DenseQTable(None, values=values.copy())
+    # exploration in choose_action draws from the global NumPy generator
+    np.random.seed(seed)
+    rng = np.random.default_rng(seed)
+    returns = []
+    caught = 0
+    for _ in range(num_episodes):
+        sim.reset_round()
+        controller = random_walk(rng)
+        total = 0.0
+        for _ in range(max_ticks):
+            outcome = sim.step(controller(sim))
+            total += enemy.get_reward(sim.player.position)
+            if outcome is not None:
+                caught += outcome == CAUGHT
+                break
+        returns.append(total)
+    return enemy.q_table.values - values, returns, caught
+
+
+def train(
+    episodes,
+    workers,
+    episodes_per_task=4,
+    max_ticks=300,
+    cell_size=10,
+    seed=0,
+    values=None,
+    report=print,
+):
+    """
+    Train for about episodes episodes and return the Q-values and the
+    per-round curve (episodes so far, episodes per second, mean return,
+    catch rate, mean absolute Q change).
+    """
+    shape = (-(-GAME_AREA[0] // cell_size), -(-GAME_AREA[1] // cell_size), 8)
+    if values is None:
+        values = np.zeros(shape, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    curve = []
+    done = 0
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(seed, cell_size)
+    ) as executor:
+        while done < episodes:
+            tasks = min(workers, -(-(episodes - done) // episodes_per_task))
+            seeds = rng.integers(2**32, size=tasks).tolist()
+            start = time.perf_counter()
+            results = list(
+                executor.map(
+                    run_episodes,
+                    [values] * tasks,
+                    [episodes_per_task] * tasks,
+                    [max_ticks] * tasks,
+                    seeds,
+                )
+            )
+            elapsed = time.perf_counter() - start
+
+            # every worker learned from the same table; average what they
+            # changed
+            delta = np.mean([result[0] for result in results], axis=0)
+            values = values + delta.astype(values.dtype)
+            returns = [r for result in results for r in result[1]]
+            caught = sum(result[2] for result in results)
+            done += len(returns)
+            changed = delta[delta != 0]
+            row = (
+                done,
+                len(returns) / elapsed,
+                float(np.mean(returns)),
+                caught / len(returns),
+                float(np.abs(changed).mean()) if len(changed) else 0.0,
+            )
+            curve.append(row)
+            report(
+                f"{row[0]:>8} {row[1]:>8.2f} {row[2]:>12.1f} {row[3]:>8.2f}"
+                f" {row[4]:>10.5f}"
+            )
+    return values, curve
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--episodes", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--episodes-per-task", type=int, default=4)
+    parser.add_argument("--max-ticks", type=int, default=300)
+    parser.add_argument(
+        "--cell-size", type=int, default=10, help="pixels per Q-learning state"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="qtable.npy")
+    parser.add_argument("--curve", default=None, help="write the curve as CSV")
+    parser.add_argument(
+        "--resume", action="store_true", help="continue training the --out table"
+    )
+    args = parser.parse_args()
+
+    values = None
+    if args.resume and os.path.exists(args.out):
+        values = np.load(args.out)
+        args.cell_size = -(-GAME_AREA[0] // values.shape[0])
+
+    print(
+        f"{'episodes':>8} {'eps/s':>8} {'mean return':>12} {'caught':>8} {'mean |dQ|':>10}"
+    )
+    start = time.perf_counter()
+    values, curve = train(
+        args.episodes,
+        args.workers,
+        args.episodes_per_task,
+        args.max_ticks,
+        args.cell_size,
+        args.seed,
+        values,
+    )
+    elapsed = time.perf_counter() - start
+    print(
+        f"{curve[-1][0]} episodes in {elapsed:.1f} s ({curve[-1][0] / elapsed:.2f}/s)"
+    )
+
+    save_q_table(args.out, DenseQTable(None, values=values))
+    print(f"saved {args.out}")
+    if args.curve:
+        with open(args.curve, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(
+                ["episodes", "episodes_per_s", "mean_return", "catch_rate", "mean_dq"]
+            )
+            writer.writerows(curve)
+
+
+if __name__ == "__main__":
+    main()
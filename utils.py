@@ -8,10 +8,16 @@
 # Authors: Ioannis Karamouzas (ioannis@cs.ucr.edu)
 #
 
+import heapq
 import math
+import time
 import pygame
-import random
 import numpy as np
+from obstacles import to_screen
+from spatial import PointGrid
+from samplers import get_sampler
+from roadmap import Roadmap
+from parallel_roadmap import validate_edges_parallel
 
 
 def scale_points(points, scale_x, scale_y, offset_x, offset_y):
@@ -21,11 +27,16 @@ def scale_points(points, scale_x, scale_y, offset_x, offset_y):
 def draw_prm_roadmap(
     screen, roadmap, points, point_color=(0, 0, 0), line_color=(0, 0, 0), point_radius=5
 ):
-    for point_index, connected_points in roadmap.items():
-        for connection_index in connected_points:
-            pygame.draw.line(
-                screen, line_color, points[point_index], points[connection_index]
-            )
+    if isinstance(roadmap, Roadmap):
+        for start, end in roadmap.segments():
+            pygame.draw.line(screen, line_color, start, end)
+        points = roadmap.points.tolist()
+    else:
+        for point_index, connected_points in roadmap.items():
+            for connection_index in connected_points:
+                pygame.draw.line(
+                    screen, line_color, points[point_index], points[connection_index]
+                )
     for point in points:
         pygame.draw.circle(
             screen, point_color, (int(point[0]), int(point[1])), point_radius
@@ -107,27 +118,38 @@ class PriorityQueue:
     """
     A Queue in which the minimum (or maximum) element (as determined by f and
     order) is returned first.
+
+    Backed by a binary heap with lazy deletion: putting an item that is
+    already queued pushes a new entry and the old one is skipped when popped.
     """
 
     def __init__(self, order=min, f=lambda v: v):
         if order == min or order == "min":
             self.order = min
+            self._sign = 1
         elif order == max or order == "max":
             self.order = max
+            self._sign = -1
         else:
             raise KeyError("order must be min or max")
         self.f = f
 
         self._dict = {}
+        self._stamps = {}
+        self._heap = []
+        self._counter = 0
 
     def get(self, item):
         return self._dict.__getitem__(item)
 
     def put(self, item, value):
-        if item not in self._dict:
-            self._dict[item] = value
-        else:
-            self._dict[item] = value
+        self._counter += 1
+        self._dict[item] = value
+        self._stamps[item] = self._counter
+        key = self.f(value)
+        if self._sign < 0:
+            key = -key
+        heapq.heappush(self._heap, (key, self._counter, item))
 
     def has(self, item):
         return self._dict.__contains__(item)
@@ -135,13 +157,34 @@ class PriorityQueue:
     def remove(self, item):
         if item in self._dict:
             del self._dict[item]
+            del self._stamps[item]
+            # drop stale entries once they dominate the heap
+            if len(self._heap) > 2 * len(self._dict) + 32:
+                self._compact()
+
+    def _compact(self):
+        self._heap = [
+            entry for entry in self._heap if self._stamps.get(entry[2]) == entry[1]
+        ]
+        heapq.heapify(self._heap)
+
+    def peek(self):
+        """The item pop() would return, left in the queue."""
+        if not self._dict:
+            raise IndexError("peek into empty priority queue")
+        while self._stamps.get(self._heap[0][2]) != self._heap[0][1]:
+            heapq.heappop(self._heap)
+        return self._heap[0][2]
 
     def pop(self):
         if not self._dict:
             raise IndexError("pop from empty priority queue")
-        tar = self.order(self._dict, key=lambda k: self.f(self._dict[k]))
-        del self._dict[tar]
-        return tar
+        while True:
+            _, stamp, item = heapq.heappop(self._heap)
+            if self._stamps.get(item) == stamp:
+                del self._dict[item]
+                del self._stamps[item]
+                return item
 
     def __iter__(self):
         return self._dict.__iter__()
@@ -156,10 +199,12 @@ class PriorityQueue:
         return self._dict.__getitem__(key)
 
     def __setitem__(self, key, value):
-        return self._dict.__setitem__(key, value)
+        self.put(key, value)
 
     def __delitem__(self, key):
-        return self._dict.__delitem__(key)
+        if key not in self._dict:
+            raise KeyError(key)
+        self.remove(key)
 
     ## added empty for astar simplicity
     def empty(self):
@@ -169,24 +214,10 @@ class PriorityQueue:
 def is_point_inside_any_obstacle(
     point, obstacles, scale_x, scale_y, offset_x, offset_y, size=None
 ):
+    screen_obstacles = to_screen(obstacles, scale_x, scale_y, offset_x, offset_y)
     if size is None:
-        for obstacle in obstacles:
-            if obstacle.contains_point(point, scale_x, scale_y, offset_x, offset_y):
-                return True
-    else:
-        half_width, half_height = size[0] / 2, size[1] / 2
-        corners = [
-            (point[0] - half_width, point[1] - half_height),
-            (point[0] + half_width, point[1] - half_height),
-            (point[0] + half_width, point[1] + half_height),
-            (point[0] - half_width, point[1] + half_height),
-        ]
-        for corner in corners:
-            if is_point_inside_any_obstacle(
-                corner, obstacles, scale_x, scale_y, offset_x, offset_y
-            ):
-                return True
-    return False
+        return bool(screen_obstacles.contains_points(point)[0])
+    return bool(screen_obstacles.boxes_collide(point, size)[0])
 
 
 def interpolate_points(p1, p2, num_points=10):
@@ -199,41 +230,109 @@ def interpolate_points(p1, p2, num_points=10):
     ]
 
 
-def is_edge_valid(
-    point1, point2, obstacles, scale_x, scale_y, offset_x, offset_y, size=(25, 25)
+def validate_edges(
+    starts,
+    ends,
+    obstacles,
+    scale_x,
+    scale_y,
+    offset_x,
+    offset_y,
+    size=(25, 25),
+    batch_size=20000,
 ):
-    interpolated_points = interpolate_points(point1, point2)
-    for point in interpolated_points:
-        if is_point_inside_any_obstacle(
-            point, obstacles, scale_x, scale_y, offset_x, offset_y, size
-        ):
-            return False
-    return True
+    """
+    Whether each edge from starts[i] to ends[i] is free, sweeping the agent's
+    box along it against the obstacles, in batches of batch_size edges.
+    """
+    starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+    ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+    screen_obstacles = to_screen(obstacles, scale_x, scale_y, offset_x, offset_y)
+    valid = np.zeros(len(starts), dtype=bool)
+    for k in range(0, len(starts), batch_size):
+        valid[k : k + batch_size] = ~screen_obstacles.sweep_boxes(
+            starts[k : k + batch_size], ends[k : k + batch_size], size
+        )
+    return valid
 
 
-# functions to improve roadmap
-def remove_loops(roadmap):
-    visited = set()
-    remove_list = []
+def edges_valid(
+    point, others, obstacles, scale_x, scale_y, offset_x, offset_y, size=(25, 25)
+):
+    """Validate the edges from point to each of others with one batched call."""
+    others = np.asarray(others, dtype=float).reshape(-1, 2)
+    starts = np.broadcast_to(np.asarray(point, dtype=float), others.shape)
+    return validate_edges(
+        starts, others, obstacles, scale_x, scale_y, offset_x, offset_y, size
+    )
 
-    def dfs(current, parent):
-        if current in visited:
-            return True
-        visited.add(current)
-        for neighbor in roadmap[current]:
-            if neighbor == parent:
-                continue
-            if dfs(neighbor, current):
-                if (current, neighbor) not in remove_list:
-                    remove_list.append((current, neighbor))
 
-    for point in list(roadmap.keys()):
-        dfs(point, None)
+def is_edge_valid(
+    point1, point2, obstacles, scale_x, scale_y, offset_x, offset_y, size=(25, 25)
+):
+    return bool(
+        edges_valid(
+            point1, [point2], obstacles, scale_x, scale_y, offset_x, offset_y, size
+        )[0]
+    )
 
-    for edge in remove_list:
-        roadmap[edge[0]].remove(edge[1])
 
-    # print(f"Number of loops removed: {len(remove_list)}")
+# functions to improve roadmap
+def spanning_forest(num_nodes, first, second, lengths=None, extra_edges=0):
+    """
+    Which of the undirected edges (first[k], second[k]) to keep so the
+    roadmap has no loops: a minimum spanning forest by Kruskal's algorithm
+    with union-find, shortest edges first. extra_edges of the edges that
+    would close a loop are kept as well, again shortest first, so there
+    are still a few alternative routes. Returns a boolean mask.
+    """
+    first = np.asarray(first, dtype=np.int64)
+    second = np.asarray(second, dtype=np.int64)
+    if lengths is None:
+        order = np.lexsort((second, first))
+    else:
+        order = np.lexsort((second, first, lengths))
+    parent = list(range(num_nodes))
+
+    def find(i):
+        while parent[i] != i:
+            # path halving keeps the trees flat
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    keep = np.zeros(len(first), dtype=bool)
+    extra = []
+    for k, a, b in zip(order.tolist(), first[order].tolist(), second[order].tolist()):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[root_a] = root_b
+            keep[k] = True
+        elif len(extra) < extra_edges and a != b:
+            extra.append(k)
+    keep[extra] = True
+    return keep
+
+
+def remove_loops(roadmap, extra_edges=0, points=None):
+    """
+    Cut the loops of a dict roadmap in place, keeping a spanning forest
+    plus extra_edges loop edges (see spanning_forest). With points, the
+    forest prefers short edges.
+    """
+    pairs = sorted(
+        {(min(i, j), max(i, j)) for i, neighbors in roadmap.items() for j in neighbors}
+    )
+    pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+    lengths = None
+    if points is not None:
+        points = np.asarray(points, dtype=float)
+        lengths = np.linalg.norm(points[pairs[:, 0]] - points[pairs[:, 1]], axis=1)
+    num_nodes = max(roadmap.keys(), default=-1) + 1
+    keep = spanning_forest(num_nodes, pairs[:, 0], pairs[:, 1], lengths, extra_edges)
+    kept = set(map(tuple, pairs[keep].tolist()))
+    for i in roadmap:
+        roadmap[i] = [j for j in roadmap[i] if (min(i, j), max(i, j)) in kept]
 
     return roadmap
 
@@ -255,51 +354,144 @@ def build_roadmap(
     scale_y,
     offset_x,
     offset_y,
+    sampler="uniform",
+    seed=None,
+    min_dist=30,
+    lazy=False,
+    extra_edges=0,
+    workers=None,
 ):
-    points = []
-    roadmap = {}
-    while len(points) < num_points:
-        point = (random.uniform(0, game_area[0]), random.uniform(0, game_area[1]))
-        if not is_point_inside_any_obstacle(
-            point, obstacles, scale_x, scale_y, offset_x, offset_y, size=(25, 25)
-        ) and not is_in_cluster(point, points):
-            points.append(point)
-    for i, point in enumerate(points):
-        roadmap[i] = []
-        for j, other_point in enumerate(points):
-            if (
-                i != j
-                and np.linalg.norm(np.array(point) - np.array(other_point))
-                < connection_radius
-            ):
-                if is_edge_valid(
-                    point,
-                    other_point,
-                    obstacles,
-                    scale_x,
-                    scale_y,
-                    offset_x,
-                    offset_y,
-                    size=(25, 25),
-                ):
-                    roadmap[i].append(j)
-    remove_loops(roadmap)
-    return roadmap, points
+    """
+    Probabilistic roadmap over the game area, returned as a Roadmap and its
+    N x 2 point array. sampler names one of samplers.SAMPLERS (or is a
+    sampler function) and seed makes the milestones reproducible. Crowded
+    maps may get fewer than num_points.
+
+    A lazy roadmap skips edge validation: it keeps every candidate edge and
+    checks each one only when a search first reaches it (see Roadmap). Its
+    loops are kept too, since blocked edges are not known yet. Otherwise
+    the roadmap is cut down to a spanning forest plus extra_edges loop
+    edges (see spanning_forest). With workers > 1 the edges are validated
+    on that many processes (see parallel_roadmap); the result is the same.
+    """
+    rng = np.random.default_rng(seed)
+    screen_obstacles = to_screen(obstacles, scale_x, scale_y, offset_x, offset_y)
+    point_array = get_sampler(sampler)(
+        num_points, game_area, screen_obstacles, rng, min_dist=min_dist, size=(25, 25)
+    )
+    index = PointGrid(point_array)
+    first, second = index.query_pairs(connection_radius)
+    if lazy:
+        edge_checker = lambda starts, ends: validate_edges(
+            starts,
+            ends,
+            obstacles,
+            scale_x,
+            scale_y,
+            offset_x,
+            offset_y,
+            size=(25, 25),
+        )
+        roadmap = Roadmap.from_edges(
+            point_array,
+            np.concatenate((first, second)),
+            np.concatenate((second, first)),
+            index=index,
+            edge_checker=edge_checker,
+        )
+        return roadmap, roadmap.points
+    if workers is not None and workers > 1:
+        valid = validate_edges_parallel(
+            index.points, first, second, screen_obstacles, workers, size=(25, 25)
+        )
+    else:
+        valid = validate_edges(
+            index.points[first],
+            index.points[second],
+            obstacles,
+            scale_x,
+            scale_y,
+            offset_x,
+            offset_y,
+            size=(25, 25),
+        )
+    first, second = first[valid], second[valid]
+    lengths = np.linalg.norm(point_array[first] - point_array[second], axis=1)
+    keep = spanning_forest(len(point_array), first, second, lengths, extra_edges)
+    first, second = first[keep], second[keep]
+
+    # each pair was validated once; mirror it into both adjacency lists. The
+    # point index used for the neighbor search serves later queries too
+    roadmap = Roadmap.from_edges(
+        point_array,
+        np.concatenate((first, second)),
+        np.concatenate((second, first)),
+        index=index,
+    )
+    return roadmap, roadmap.points
 
 
 # pathfinding logic for enemy
 def heuristic(current_point, player_position):
-    return np.linalg.norm(np.array(current_point) - np.array(player_position))
+    return math.hypot(
+        current_point[0] - player_position[0], current_point[1] - player_position[1]
+    )
 
 
-def closest_point_index(position, points):
+def closest_point_index(position, points, index=None):
+    if index is not None:
+        return index.nearest(position)
     return min(
         range(len(points)),
         key=lambda i: np.linalg.norm(np.array(position) - np.array(points[i])),
     )
 
 
-def find_path(start_idx, roadmap, points, player_position):
+def set_enemy_path(enemy, points, path_indices):
+    """
+    Give enemy the path through the nodes path_indices. Paths are planned
+    from the enemy's nearest node, which it may already stand on or have
+    left towards the next one; that node is dropped then, so the enemy
+    heads on instead of stepping back onto it every tick.
+    """
+    path = [points[i] for i in path_indices]
+    if len(enemy.path):
+        # keep heading for the node the enemy is on its way to, if the new
+        # path passes it, so that replanning from whichever node happens to
+        # be nearest does not turn the enemy back and forth
+        for i, point in enumerate(path):
+            if np.array_equal(point, enemy.path[0]):
+                enemy.path = path[i:]
+                return
+    if len(path) > 1:
+        first, second = np.asarray(path[0]), np.asarray(path[1])
+        if np.linalg.norm(second - enemy.position) <= np.linalg.norm(second - first):
+            path.pop(0)
+    enemy.path = path
+
+
+def find_path(
+    start_idx, roadmap, points, player_position, all_pairs=None, goal_idx=None
+):
+    """
+    A* from start_idx towards player_position. With goal_idx it is plain
+    goal-directed A* that ends at that node, returning [start_idx] if the
+    node cannot be reached; on a lazy roadmap only the edges of the nodes
+    it expands get collision checked.
+    """
+    if not isinstance(roadmap, Roadmap):
+        roadmap = Roadmap.from_adjacency(roadmap, points)
+    if all_pairs is not None:
+        # precomputed paths: a walk through the next-hop table
+        goal_idx = closest_point_index(player_position, points, roadmap.index)
+        return all_pairs.path(start_idx, goal_idx) or [start_idx]
+    # heuristic of every node in one vectorized pass; edge costs come from
+    # the precomputed weights
+    goal = np.asarray(player_position, dtype=float)
+    h = np.hypot(*(roadmap.points - goal).T).tolist()
+    # the open-ended search weighs path cost double
+    cost_weight = 2 if goal_idx is None else 1
+
     frontier = PriorityQueue()
     frontier.put(start_idx, 0)
     came_from = {start_idx: None}
@@ -307,22 +499,21 @@ def find_path(start_idx, roadmap, points, player_position):
 
     while not frontier.empty():
         current = frontier.pop()
-        current_point = points[current]
 
-        if heuristic(current_point, player_position) < 0.5:
+        if current == goal_idx or (goal_idx is None and h[current] < 0.5):
             break
 
-        for next_idx in roadmap[current]:
-            next_point = points[next_idx]
-            new_cost = cost_so_far[current] + np.linalg.norm(
-                np.array(current_point) - np.array(next_point)
-            )
+        # on a lazy roadmap this collision checks the edges on first use
+        for next_idx, weight in zip(*roadmap.valid_neighbors(current)):
+            new_cost = cost_so_far[current] + weight
             if next_idx not in cost_so_far or new_cost < cost_so_far[next_idx]:
                 cost_so_far[next_idx] = new_cost
-                priority = new_cost * 2 + heuristic(next_point, player_position)
+                priority = new_cost * cost_weight + h[next_idx]
                 frontier.put(next_idx, priority)
                 came_from[next_idx] = current
 
+    if goal_idx is not None and current != goal_idx:
+        return [start_idx]
     path = [current]
     while came_from[current] is not None:
         current = came_from[current]
@@ -332,9 +523,371 @@ def find_path(start_idx, roadmap, points, player_position):
     return path
 
 
-def update_enemy_path(enemy, player_position, roadmap, points):
+class DistanceField:
+    """
+    Shortest distances and next hops from every roadmap node to one goal
+    node, from a single Dijkstra search over the reversed edges. All enemies
+    chasing the same goal read their paths from it in O(path length).
+    """
+
+    def __init__(self, roadmap):
+        self.roadmap = roadmap
+        self.goal = None
+        self.dist = None
+        self.next_hop = None
+
+    def update(self, goal_idx):
+        """Recompute for a new goal node; returns whether it searched."""
+        if goal_idx == self.goal:
+            return False
+        reverse = self.roadmap.transpose()
+        num_nodes = self.roadmap.num_nodes
+        dist = [math.inf] * num_nodes
+        next_hop = [-1] * num_nodes
+        dist[goal_idx] = 0.0
+        heap = [(0.0, goal_idx)]
+        while heap:
+            d, current = heapq.heappop(heap)
+            if d > dist[current]:
+                continue
+            for prev_idx, weight in zip(*reverse.valid_neighbors(current)):
+                new_dist = d + weight
+                if new_dist < dist[prev_idx]:
+                    dist[prev_idx] = new_dist
+                    next_hop[prev_idx] = current
+                    heapq.heappush(heap, (new_dist, prev_idx))
+        self.goal = goal_idx
+        self.dist = dist
+        self.next_hop = next_hop
+        return True
+
+    def path_from(self, start_idx):
+        """Node indices from start_idx to the goal, [] if it is unreachable."""
+        if self.dist[start_idx] == math.inf:
+            return []
+        path = [start_idx]
+        while path[-1] != self.goal:
+            path.append(self.next_hop[path[-1]])
+        return path
+
+
+class IncrementalPlanner:
+    """
+    D* Lite over a Roadmap for one pursuer. The search runs backwards from
+    the goal and keeps its g/rhs values between calls: when the pursuer's
+    start node moves, only the key offset km grows, and when the goal node
+    or an edge cost changes, only the affected vertices are repaired. A
+    virtual node tied to the current goal node by a zero-cost edge lets the
+    goal move as a plain edge-cost change.
+    """
+
+    def __init__(self, roadmap):
+        self.roadmap = roadmap
+        self.reverse = roadmap.transpose()
+        self.points = roadmap.points.tolist()
+        self.virtual = roadmap.num_nodes
+        self.cost_overrides = {}
+        self.start = None
+        self.goal = None
+        self.expansions = 0
+
+    def _reset(self, start_idx, goal_idx):
+        num_nodes = self.roadmap.num_nodes + 1
+        self.g = [math.inf] * num_nodes
+        self.rhs = [math.inf] * num_nodes
+        self.km = 0.0
+        self.start = self.last_start = start_idx
+        self.goal = goal_idx
+        self.queue = PriorityQueue()
+        self.rhs[self.virtual] = 0.0
+        self.queue.put(self.virtual, self._key(self.virtual))
+
+    def _h(self, s):
+        # the virtual node sits on the goal node, which keeps h consistent
+        a = self.points[self.start]
+        b = self.points[self.goal if s == self.virtual else s]
+        return math.hypot(a[0] - b[0], a[1] - b[1])
+
+    def _key(self, s):
+        m = min(self.g[s], self.rhs[s])
+        return (m + self._h(s) + self.km, m)
+
+    def _successors(self, u):
+        if u == self.virtual:
+            return []
+        succ = zip(*self.roadmap.valid_neighbors(u))
+        if self.cost_overrides:
+            succ = [(v, self.cost_overrides.get((u, v), c)) for v, c in succ]
+        if u == self.goal:
+            succ = list(succ) + [(self.virtual, 0.0)]
+        return succ
+
+    def _predecessors(self, u):
+        if u == self.virtual:
+            return [self.goal]
+        return self.reverse.valid_neighbors(u)[0]
+
+    def _update_vertex(self, u):
+        if u != self.virtual:
+            self.rhs[u] = min(
+                (c + self.g[v] for v, c in self._successors(u)), default=math.inf
+            )
+        self.queue.remove(u)
+        if self.g[u] != self.rhs[u]:
+            self.queue.put(u, self._key(u))
+
+    def _compute_shortest_path(self):
+        queue = self.queue
+        while not queue.empty() and (
+            queue.get(queue.peek()) < self._key(self.start)
+            or self.rhs[self.start] != self.g[self.start]
+        ):
+            k_old = queue.get(queue.peek())
+            u = queue.pop()
+            self.expansions += 1
+            k_new = self._key(u)
+            if k_old < k_new:
+                queue.put(u, k_new)
+            elif self.g[u] > self.rhs[u]:
+                self.g[u] = self.rhs[u]
+                for s in self._predecessors(u):
+                    self._update_vertex(s)
+            else:
+                self.g[u] = math.inf
+                for s in self._predecessors(u) + [u]:
+                    self._update_vertex(s)
+
+    def set_edge_cost(self, u, v, cost):
+        """Change the cost of edge u -> v, e.g. to inf once it is blocked."""
+        self.cost_overrides[(u, v)] = cost
+        if self.start is not None:
+            self._move_start(self.start)
+            self._update_vertex(u)
+
+    def _move_start(self, start_idx):
+        self.km += math.hypot(
+            self.points[self.last_start][0] - self.points[start_idx][0],
+            self.points[self.last_start][1] - self.points[start_idx][1],
+        )
+        self.start = self.last_start = start_idx
+
+    def plan(self, start_idx, goal_idx):
+        """Node indices from start_idx to goal_idx, [] if unreachable."""
+        if self.start is None:
+            self._reset(start_idx, goal_idx)
+        else:
+            if start_idx != self.start:
+                self._move_start(start_idx)
+            if goal_idx != self.goal:
+                # the virtual edge moves from the old goal to the new one
+                old_goal, self.goal = self.goal, goal_idx
+                self._update_vertex(old_goal)
+                self._update_vertex(goal_idx)
+        self._compute_shortest_path()
+
+        if self.g[start_idx] == math.inf:
+            return []
+        path = [start_idx]
+        while path[-1] != goal_idx and len(path) <= self.roadmap.num_nodes:
+            path.append(
+                min(self._successors(path[-1]), key=lambda vc: vc[1] + self.g[vc[0]])[0]
+            )
+        return path
+
+
+class AnytimePlanner:
+    """
+    ARA* over a Roadmap: weighted A* with f = g + epsilon * h, run first with
+    a large epsilon for a quick, suboptimal path and then again with smaller
+    ones, each pass reusing the previous search. plan() works within a time
+    budget and picks up where it stopped on the next call, so a frame never
+    waits for the search to finish. The path from a pass with epsilon e is
+    at most e times longer than the shortest one.
+    """
+
+    def __init__(self, roadmap, epsilons=(3.0, 2.0, 1.5, 1.25, 1.0)):
+        self.roadmap = roadmap
+        self.points = roadmap.points.tolist()
+        self.epsilons = epsilons
+        self.start = None
+        self.goal = None
+        self.stage = 0
+        self.path = []
+        self.expansions = 0
+
+    def _reset(self, start_idx, goal_idx):
+        self.start, self.goal = start_idx, goal_idx
+        self.h = {}
+        self.g = {start_idx: 0.0}
+        self.came_from = {start_idx: None}
+        self.stage = 0
+        self.open = PriorityQueue()
+        self.open.put(start_idx, self.epsilons[0] * self._h(start_idx))
+        self.closed = set()
+        self.incons = set()
+        # nodes still to be queued with the keys of the current pass
+        self.pending = []
+        # best path so far and the epsilon it was found with
+        self.path = []
+        self.epsilon = math.inf
+
+    def _h(self, node):
+        # only computed for the nodes the search reaches
+        if node not in self.h:
+            a, b = self.points[node], self.points[self.goal]
+            self.h[node] = math.hypot(a[0] - b[0], a[1] - b[1])
+        return self.h[node]
+
+    @property
+    def done(self):
+        """Whether the path is optimal and there is nothing left to refine."""
+        return self.stage >= len(self.epsilons)
+
+    def _improve_path(self, deadline):
+        """One weighted A* pass; returns False if the deadline hit first."""
+        epsilon = self.epsilons[self.stage]
+        g, open_, closed = self.g, self.open, self.closed
+        goal = self.goal
+        steps = 0
+        while self.pending:
+            if deadline is not None and steps % 64 == 0:
+                if time.perf_counter_ns() >= deadline:
+                    return False
+            steps += 1
+            node = self.pending.pop()
+            open_.put(node, g[node] + epsilon * self._h(node))
+        while not open_.empty():
+            current = open_.peek()
+            if g.get(goal, math.inf) <= open_.get(current):
+                break
+            if deadline is not None and steps % 16 == 0:
+                if time.perf_counter_ns() >= deadline:
+                    return False
+            steps += 1
+            open_.pop()
+            closed.add(current)
+            self.expansions += 1
+            for next_idx, weight in zip(*self.roadmap.valid_neighbors(current)):
+                new_cost = g[current] + weight
+                if new_cost < g.get(next_idx, math.inf):
+                    g[next_idx] = new_cost
+                    self.came_from[next_idx] = current
+                    if next_idx in closed:
+                        self.incons.add(next_idx)
+                    else:
+                        open_.put(next_idx, new_cost + epsilon * self._h(next_idx))
+        return True
+
+    def _finish_stage(self):
+        if self.goal in self.g:
+            path = [self.goal]
+            while self.came_from[path[-1]] is not None:
+                path.append(self.came_from[path[-1]])
+            path.reverse()
+            self.path = path
+        self.epsilon = self.epsilons[self.stage]
+        self.stage += 1
+        if self.done:
+            return
+        # the next pass starts from the open and inconsistent nodes; they are
+        # queued with the smaller epsilon's keys as part of that pass
+        self.pending = list(set(self.open) | self.incons)
+        self.open = PriorityQueue()
+        self.closed = set()
+        self.incons = set()
+
+    def plan(self, start_idx, goal_idx, budget_us=None):
+        """
+        Best path from start_idx to goal_idx found within budget_us
+        microseconds (no limit if None). Returns [] if no path is known yet;
+        a new start or goal restarts the search.
+        """
+        if (start_idx, goal_idx) != (self.start, self.goal):
+            self._reset(start_idx, goal_idx)
+        deadline = None
+        if budget_us is not None:
+            deadline = time.perf_counter_ns() + int(budget_us * 1000)
+        while not self.done:
+            if not self._improve_path(deadline):
+                break
+            self._finish_stage()
+        return self.path
+
+
+def update_enemy_path(
+    enemy,
+    player_position,
+    roadmap,
+    points,
+    index=None,
+    distance_field=None,
+    all_pairs=None,
+    hierarchy=None,
+):
     if not enemy.locked_on_path:
-        goal_idx = closest_point_index(player_position, points)
+        if index is None and isinstance(roadmap, Roadmap):
+            index = roadmap.index
+        if enemy.use_incremental_planner:
+            # the enemy keeps its own search tree between frames
+            if (
+                not isinstance(enemy.planner, IncrementalPlanner)
+                or enemy.planner.roadmap is not roadmap
+            ):
+                enemy.planner = IncrementalPlanner(roadmap)
+            goal_idx = closest_point_index(player_position, points, index)
+            start_idx = closest_point_index(enemy.position, points, index)
+            path_indices = enemy.planner.plan(start_idx, goal_idx) or [start_idx]
+            set_enemy_path(enemy, points, path_indices)
+            return
+        if enemy.planning_budget_us is not None:
+            # anytime search: take the best path so far, refine next frame
+            if (
+                not isinstance(enemy.planner, AnytimePlanner)
+                or enemy.planner.roadmap is not roadmap
+            ):
+                enemy.planner = AnytimePlanner(roadmap)
+            goal_idx = closest_point_index(player_position, points, index)
+            start_idx = closest_point_index(enemy.position, points, index)
+            path_indices = enemy.planner.plan(
+                start_idx, goal_idx, enemy.planning_budget_us
+            )
+            if path_indices:
+                set_enemy_path(enemy, points, path_indices)
+            elif not enemy.path:
+                enemy.path = [points[start_idx]]
+            return
+        if all_pairs is not None:
+            start_idx = closest_point_index(enemy.position, points, index)
+            goal_idx = closest_point_index(player_position, points, index)
+            path_indices = all_pairs.path(start_idx, goal_idx) or [start_idx]
+            set_enemy_path(enemy, points, path_indices)
+            return
+        if hierarchy is not None:
+            # portal graph first, then only the clusters along the route
+            start_idx = closest_point_index(enemy.position, points, index)
+            goal_idx = closest_point_index(player_position, points, index)
+            path_indices = hierarchy.path(start_idx, goal_idx) or [start_idx]
+            set_enemy_path(enemy, points, path_indices)
+            return
+        if distance_field is not None:
+            # shared search towards the player, redone only when the
+            # player's nearest node changes
+            distance_field.update(closest_point_index(player_position, points, index))
+            start_idx = closest_point_index(enemy.position, points, index)
+            path_indices = distance_field.path_from(start_idx) or [start_idx]
+            set_enemy_path(enemy, points, path_indices)
+            return
+        if isinstance(roadmap, Roadmap) and roadmap.lazy:
+            # a search per enemy that stops at the player's node checks a
+            # fraction of the edges a field over the whole roadmap would
+            start_idx = closest_point_index(enemy.position, points, index)
+            goal_idx = closest_point_index(player_position, points, index)
+            path_indices = find_path(
+                start_idx, roadmap, points, player_position, goal_idx=goal_idx
+            )
+            set_enemy_path(enemy, points, path_indices)
+            return
+        goal_idx = closest_point_index(player_position, points, index)
         path_indices = find_path(goal_idx, roadmap, points, player_position)
         enemy.path = [points[i] for i in path_indices]
 